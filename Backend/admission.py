@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+
+class Shed(Exception):
+    """Raised when a Gemini call is refused; ``reason`` labels gemini_shed_total."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+# -----------------------------
+# Token buckets
+# -----------------------------
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class RateLimiter:
+    """A token bucket per client (LRU-bounded to ``max_clients``) plus one
+    global bucket. A rate <= 0 disables that bucket."""
+
+    def __init__(self, client_rate, client_burst, global_rate, global_burst, max_clients=10000):
+        self.client_rate, self.client_burst = client_rate, max(client_burst, 1)
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._global = TokenBucket(global_rate, max(global_burst, 1), time.monotonic()) if global_rate > 0 else None
+        self._lock = threading.Lock()
+
+    def check(self, client=None):
+        """Take one token; returns None if admitted, else the shed reason."""
+        now = time.monotonic()
+        with self._lock:
+            return self._check_client_locked(client, now) or self._check_global_locked(now)
+
+    def check_client(self, client):
+        """Take a token from ``client``'s bucket only (once per /chat/batch)."""
+        with self._lock:
+            return self._check_client_locked(client, time.monotonic())
+
+    def check_global(self):
+        """Take a token from the global bucket only (per batch Gemini call)."""
+        with self._lock:
+            return self._check_global_locked(time.monotonic())
+
+    def _check_client_locked(self, client, now):
+        if self.client_rate > 0 and client is not None:
+            bucket = self._clients.get(client)
+            if bucket is None:
+                bucket = self._clients[client] = TokenBucket(self.client_rate, self.client_burst, now)
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(client)
+            if not bucket.take(now):
+                return "client_rate"
+        return None
+
+    def _check_global_locked(self, now):
+        if self._global is not None and not self._global.take(now):
+            return "global_rate"
+        return None
+
+
+# -----------------------------
+# Bounded wait queue
+# -----------------------------
+class BoundedSlots:
+    """At most ``concurrency`` holders; at most ``max_waiting`` callers wait,
+    each for at most ``wait_timeout`` seconds, before being shed.
+
+    ``slot(batch=True)`` waits without either limit (batch jobs), but at most
+    ``batch_concurrency`` batch callers hold or wait for a slot at a time, so
+    a large batch never queues ahead of interactive callers or takes more than
+    that share of the slots.
+    """
+
+    def __init__(self, concurrency, max_waiting, wait_timeout, batch_concurrency=None):
+        self._slots = asyncio.Semaphore(concurrency)
+        self._batch_slots = asyncio.Semaphore(batch_concurrency or max(concurrency // 2, 1))
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self, batch=False):
+        if batch:
+            async with self._batch_slots:
+                async with self._slots:
+                    yield
+            return
+        if self._slots.locked():
+            if self.waiting >= self.max_waiting:
+                raise Shed("queue_full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise Shed("queue_timeout") from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+# -----------------------------
+# Circuit breaker
+# -----------------------------
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures. While open or
+    half-open every call is refused; ``run_probe`` tests the dependency in the
+    background once ``reset_timeout`` has passed and closes the breaker on
+    success, so no user request is spent on probing."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                logging.info("Gemini circuit closed.")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self._open_locked()
+
+    def _open_locked(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        logging.warning("Gemini circuit open after %d consecutive failures; probing in %ss.",
+                        self.failures, self.reset_timeout)
+
+    async def run_probe(self, probe, check_interval=1.0):
+        while True:
+            if self.state != self.OPEN:
+                await asyncio.sleep(check_interval)
+                continue
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+                continue
+            self.state = self.HALF_OPEN
+            try:
+                await probe()
+            except Exception as e:
+                logging.warning("Gemini probe failed: %s", e)
+                with self._lock:
+                    self._open_locked()
+            else:
+                self.record_success()
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+# -----------------------------
+# AI answer cache
+# -----------------------------
+class AnswerCache:
+    """Bounded LRU + TTL cache for generated answers, with single-flight loading.
+
+    Concurrent ``get_or_compute`` (threads) or ``aget_or_compute`` (coroutines)
+    calls for the same key share one computation. When ``path`` is given, entries
+    are also written to a SQLite file so they survive restarts. Failed
+    computations are never cached.
+
+    The SQLite tier never runs on the caller's lock or event loop: unexpired
+    rows are loaded into memory at startup, a memory miss reads the file only
+    from the single-flight leader (on a worker thread for coroutines), and
+    writes are queued for a background thread that commits them in batches.
+    """
+
+    WRITE_BATCH = 500
+
+    def __init__(self, max_entries=1024, ttl=3600.0, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, answer)
+        self._inflight = {}            # key -> Future shared by waiting threads
+        self._ainflight = {}           # key -> asyncio.Future shared by waiting tasks
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = 0
+
+        self._db = None
+        self._db_lock = threading.Lock()  # one connection, shared by readers and the writer
+        self._writes = queue.Queue()
+        self._writer = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                # WAL + NORMAL: one fsync per checkpoint instead of per commit.
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS answers "
+                    "(key TEXT PRIMARY KEY, answer TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                now = time.time()
+                self._db.execute("DELETE FROM answers WHERE expires_at < ?", (now,))
+                self._db.commit()
+                rows = self._db.execute(
+                    "SELECT key, answer, expires_at FROM answers ORDER BY expires_at DESC LIMIT ?", (max_entries,)
+                ).fetchall()
+                for key, answer, expires_at in reversed(rows):
+                    self._remember_locked(key, answer, expires_at)
+            except sqlite3.Error as e:
+                logging.warning("Answer cache disk tier disabled (%s): %s", path, e)
+                self._db = None
+            else:
+                self._writer = threading.Thread(target=self._write_loop, name="answer-cache-writer", daemon=True)
+                self._writer.start()
+
+    # -- storage -------------------------------------------------------------
+    def _get_locked(self, key, now):
+        """Memory tier only; see _read_disk."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+        return None
+
+    def _read_disk(self, key):
+        """Unexpired answer for ``key`` from the SQLite tier (blocking), kept in memory."""
+        db = self._db
+        if db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = db.execute(
+                    "SELECT answer, expires_at FROM answers WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning("Answer cache disk read failed: %s", e)
+            return None
+        if row is None or row[1] <= time.time():
+            return None
+        with self._lock:
+            self._remember_locked(key, row[0], row[1])
+        return row[0]
+
+    def _write_loop(self):
+        while True:
+            rows = [self._writes.get()]
+            while len(rows) < self.WRITE_BATCH:
+                try:
+                    rows.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            closing = rows[-1] is None
+            rows = [row for row in rows if row is not None]
+            if rows:
+                try:
+                    with self._db_lock:
+                        self._db.executemany(
+                            "INSERT OR REPLACE INTO answers (key, answer, expires_at) VALUES (?, ?, ?)", rows
+                        )
+                        self._db.commit()
+                except sqlite3.Error as e:
+                    logging.warning("Answer cache disk write failed: %s", e)
+            if closing:
+                return
+
+    def _remember_locked(self, key, answer, expires_at):
+        self._entries[key] = (expires_at, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._get_locked(key, time.time())
+
+    def put(self, key, answer):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember_locked(key, answer, expires_at)
+        if self._writer is not None:
+            self._writes.put((key, answer, expires_at))
+
+    def close(self):
+        """Write out queued entries and close the SQLite file (blocking)."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+    # -- single-flight ---------------------------------------------------------
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            answer = self._get_locked(key, time.time())
+            if answer is not None:
+                self.hits += 1
+                return answer
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            answer = self._read_disk(key)
+            self._count(answer is not None)
+            if answer is None:
+                answer = compute()
+                self.put(key, answer)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(answer)
+            return answer
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_compute(self, key, compute):
+        """Async variant of ``get_or_compute``; ``compute`` returns an awaitable."""
+        with self._lock:
+            answer = self._get_locked(key, time.time())
+            if answer is not None:
+                self.hits += 1
+                return answer
+            future = self._ainflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._ainflight[key] = asyncio.get_running_loop().create_future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # shield: a cancelled waiter must not cancel the shared call.
+            return await asyncio.shield(future)
+
+        try:
+            answer = await asyncio.to_thread(self._read_disk, key) if self._db is not None else None
+            self._count(answer is not None)
+            if answer is None:
+                answer = await compute()
+                self.put(key, answer)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                e = RuntimeError("shared computation was cancelled")
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(answer)
+            return answer
+        finally:
+            with self._lock:
+                self._ainflight.pop(key, None)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "inflight": len(self._inflight) + len(self._ainflight),
+                "persistent": self._db is not None,
+            }
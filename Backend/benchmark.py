@@ -0,0 +1,411 @@
+# benchmark.py
+"""Offline latency/throughput benchmark for the /chat pipeline.
+
+Runs the FastAPI app in-process (httpx ASGI transport, no network) against
+the InMemoryCollection fallback and a stub Gemini model, over synthetic FAQ
+corpora derived from data/faqs.jsonl. Reports p50/p95/p99 latency and
+requests/sec per response source and writes everything to JSON so runs can be
+compared between commits.
+
+Usage:
+    python benchmark.py --sizes 50,1000,10000,100000 --concurrency 1,16,64 \\
+        --requests 2000 --gemini-latency-ms 300 --out bench_results.json
+
+    python benchmark.py --cold-start 5   # import-to-first-response time
+
+    python benchmark.py --spell-report --typo-rate 0.3   # sources moved by spelling correction
+
+Needs httpx (pip install httpx) in addition to the backend dependencies.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+# Configure main.py for offline use before it is imported.
+os.environ["MONGO_URL"] = ""
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+os.environ.setdefault("FAQ_CACHE_POLL_SECONDS", "3600")
+# Every simulated user shares one client address; measure the pipeline, not the limiter.
+os.environ.setdefault("GEMINI_CLIENT_RATE", "0")
+os.environ.setdefault("GEMINI_GLOBAL_RATE", "0")
+# Keep synthetic traffic out of the chat event log that mine_questions.py reads.
+os.environ.setdefault("CHAT_EVENTS_PATH", "")
+
+import httpx  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEED_FILE = os.path.join(HERE, "data", "faqs.jsonl")
+
+TOPICS = ["hostel", "library", "exam", "placement", "admission", "scholarship", "canteen",
+          "transport", "syllabus", "circular", "semester", "lab", "timetable", "result",
+          "revaluation", "sports", "fest", "internship", "club", "attendance"]
+DEPARTMENTS = ["cse", "ise", "ece", "eee", "mechanical", "civil", "mba", "ai ml", "mathematics"]
+HOD_QUESTIONS = ["Who is the HOD of {}?", "hod of {} department", "{} hod name"]
+AI_QUESTIONS = ["Can I change my {} elective after the first week?",
+                "What documents are needed for {} verification at the college?",
+                "Is there a {} helpdesk on Saturdays at the college?"]
+FALLBACK_QUESTIONS = ["What's the weather like today?", "Tell me a joke",
+                      "Who won the match yesterday?", "Recommend a good movie"]
+
+
+# -----------------------------
+# Stub Gemini
+# -----------------------------
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StubStream:
+    def __init__(self, text, delay):
+        self._words = text.split(" ")
+        self._delay = delay
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._words:
+            raise StopAsyncIteration
+        await asyncio.sleep(self._delay)
+        return _StubResponse(self._words.pop(0) + " ")
+
+
+class StubGeminiModel:
+    """Stands in for genai.GenerativeModel with configurable latency and errors."""
+
+    def __init__(self, latency_ms=300.0, jitter_ms=100.0, error_rate=0.0, seed=0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self):
+        return max(0.0, self.random.gauss(self.latency, self.jitter))
+
+    def _answer(self, prompt):
+        self.calls += 1
+        if self.random.random() < self.error_rate:
+            raise RuntimeError("stub Gemini error")
+        return f"Stub answer for: {prompt.splitlines()[-1]}"
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        if stream:
+            text = self._answer(prompt)
+            return _StubStream(text, self._delay() / max(1, len(text.split(" "))))
+        await asyncio.sleep(self._delay())
+        return _StubResponse(self._answer(prompt))
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self._delay())
+        return _StubResponse(self._answer(prompt))
+
+
+# -----------------------------
+# Synthetic corpora and workload
+# -----------------------------
+def load_seed():
+    with open(SEED_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_corpus(size, seed_faqs, rng):
+    """``size`` FAQs in the faq_data shape; the seed set first, then variants."""
+    corpus = [dict(doc) for doc in seed_faqs[:size]]
+    while len(corpus) < size:
+        base = seed_faqs[len(corpus) % len(seed_faqs)]
+        topic, dept = rng.choice(TOPICS), rng.choice(DEPARTMENTS)
+        corpus.append({
+            "question": f"{base['question'].rstrip('?')} for {dept} {topic} {len(corpus)}?",
+            "answer": f"{base['answer']} ({dept}/{topic} #{len(corpus)})",
+        })
+    return corpus
+
+
+def _perturb(question, rng):
+    words = question.split()
+    if len(words) > 3 and rng.random() < 0.5:
+        words.pop(rng.randrange(len(words)))
+    return " ".join(words)
+
+
+def _typo(question, rng):
+    """One realistic misspelling in a word of 5+ letters: swap, drop, double or replace a letter."""
+    words = question.split(" ")
+    candidates = [i for i, w in enumerate(words) if len(w.rstrip("?.,")) >= 5 and w.rstrip("?.,").isalpha()]
+    if not candidates:
+        return question
+    i = rng.choice(candidates)
+    core = words[i].rstrip("?.,")
+    tail = words[i][len(core):]
+    pos = rng.randrange(1, len(core) - 1)
+    kind = rng.choice(("swap", "drop", "double", "replace"))
+    if kind == "swap":
+        core = core[:pos] + core[pos + 1] + core[pos] + core[pos + 2:]
+    elif kind == "drop":
+        core = core[:pos] + core[pos + 1:]
+    elif kind == "double":
+        core = core[:pos] + core[pos] + core[pos:]
+    else:
+        core = core[:pos] + rng.choice("abcdefghijklmnopqrstuvwxyz") + core[pos + 1:]
+    words[i] = core + tail
+    return " ".join(words)
+
+
+def workload(corpus, count, mix, rng):
+    """``count`` questions drawn by the expected source mix."""
+    kinds, weights = zip(*mix.items())
+    questions = []
+    for kind in rng.choices(kinds, weights=weights, k=count):
+        if kind == "rule":
+            questions.append(rng.choice(HOD_QUESTIONS).format(rng.choice(DEPARTMENTS)))
+        elif kind == "faq":
+            questions.append(_perturb(rng.choice(corpus)["question"], rng))
+        elif kind == "ai":
+            questions.append(rng.choice(AI_QUESTIONS).format(rng.choice(TOPICS)))
+        else:
+            questions.append(rng.choice(FALLBACK_QUESTIONS))
+    return questions
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values) - 1, max(0, round(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, wall_seconds):
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "rps": round(len(ordered) / wall_seconds, 2) if wall_seconds else None,
+        "p50_ms": round(_percentile(ordered, 50) * 1e3, 3) if ordered else None,
+        "p95_ms": round(_percentile(ordered, 95) * 1e3, 3) if ordered else None,
+        "p99_ms": round(_percentile(ordered, 99) * 1e3, 3) if ordered else None,
+        "max_ms": round(ordered[-1] * 1e3, 3) if ordered else None,
+    }
+
+
+async def drive(app, questions, concurrency):
+    """POST every question to /chat with ``concurrency`` workers."""
+    latencies = defaultdict(list)
+    queue = iter(questions)
+
+    async def worker(client):
+        for question in queue:
+            started = time.perf_counter()
+            response = await client.post("/chat", json={"user_message": question})
+            elapsed = time.perf_counter() - started
+            source = response.json().get("source", "error") if response.status_code == 200 else "http_error"
+            latencies[source].append(elapsed)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return latencies, wall
+
+
+async def run(args):
+    import main
+
+    stub = StubGeminiModel(args.gemini_latency_ms, args.gemini_jitter_ms, args.gemini_error_rate, args.seed)
+    main._gemini_model = stub
+    seed_faqs = load_seed()
+    mix = {"rule": args.mix[0], "faq": args.mix[1], "ai": args.mix[2], "fallback": args.mix[3]}
+    results = []
+
+    async with main.app.router.lifespan_context(main.app):
+        for size in args.sizes:
+            rng = random.Random(args.seed)
+            corpus = synthetic_corpus(size, seed_faqs, rng)
+            main.faqs.docs = corpus
+            started = time.perf_counter()
+            main.faq_corpus.refresh()
+            load_seconds = time.perf_counter() - started
+
+            for concurrency in args.concurrency:
+                questions = workload(corpus, args.requests, mix, random.Random(args.seed + concurrency))
+                # Warm-up pass so one-off costs do not land in the percentiles.
+                await drive(main.app, questions[: min(50, len(questions))], concurrency)
+                calls_before = stub.calls
+                latencies, wall = await drive(main.app, questions, concurrency)
+                all_latencies = [x for values in latencies.values() for x in values]
+                results.append({
+                    "corpus_size": size,
+                    "concurrency": concurrency,
+                    "corpus_load_seconds": round(load_seconds, 4),
+                    "wall_seconds": round(wall, 4),
+                    "gemini_calls": stub.calls - calls_before,
+                    "overall": summarize(all_latencies, wall),
+                    "by_source": {source: summarize(values, wall) for source, values in sorted(latencies.items())},
+                })
+                overall = results[-1]["overall"]
+                print(f"size={size:<7} c={concurrency:<4} rps={overall['rps']:<9} "
+                      f"p50={overall['p50_ms']}ms p99={overall['p99_ms']}ms", file=sys.stderr)
+    return results
+
+
+def _local_source(main, question):
+    """Source /chat would answer ``question`` from, without calling Gemini."""
+    query = main._correct(question)
+    route = main.intent_router.classify(query)
+    if route.answer:
+        return "rule"
+    if main.get_best_faq_match(query):
+        return "faq"
+    return "ai" if route.college_related else "fallback"
+
+
+def spell_report(args):
+    """Resolve a misspelled workload with spelling correction off and on and
+    count how each question's source moves."""
+    import main
+
+    logging.getLogger().setLevel(logging.WARNING)
+    seed_faqs = load_seed()
+    mix = {"rule": args.mix[0], "faq": args.mix[1], "ai": args.mix[2], "fallback": args.mix[3]}
+    results = []
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, seed_faqs, random.Random(args.seed))
+        main.faqs.docs = corpus
+        main.faq_corpus.refresh()
+        main.spell_corrector.warm()
+
+        rng = random.Random(args.seed)
+        questions = [_typo(q, rng) if rng.random() < args.typo_rate else q
+                     for q in workload(corpus, args.requests, mix, rng)]
+        moves = Counter()
+        for question in questions:
+            main.SPELL_CORRECTION = False
+            before = _local_source(main, question)
+            main.SPELL_CORRECTION = True
+            after = _local_source(main, question)
+            moves[(before, after)] += 1
+
+        local, remote = ("faq", "rule"), ("ai", "fallback")
+        results.append({
+            "corpus_size": size,
+            "requests": len(questions),
+            "typo_rate": args.typo_rate,
+            "moved_to_local": sum(n for (b, a), n in moves.items() if b in remote and a in local),
+            "moved_to_remote": sum(n for (b, a), n in moves.items() if b in local and a in remote),
+            "changed": sum(n for (b, a), n in moves.items() if b != a),
+            "transitions": {f"{b}->{a}": n for (b, a), n in sorted(moves.items()) if b != a},
+        })
+        print(f"size={size:<7} moved ai/fallback->faq/rule: {results[-1]['moved_to_local']} "
+              f"faq/rule->ai/fallback: {results[-1]['moved_to_remote']} of {len(questions)}", file=sys.stderr)
+    return results
+
+
+_COLD_START_PROBE = """
+import asyncio, os, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, os.getcwd())
+import main
+import httpx
+t_import = time.perf_counter()
+
+async def first_response():
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            response = await client.post("/chat", json={"user_message": "Who is the HOD of CSE?"})
+            response.raise_for_status()
+
+asyncio.run(first_response())
+print(t_import - t0, time.perf_counter() - t0)
+"""
+
+
+def cold_start(repeats, mongo_url):
+    """Median import time and import-to-first-/chat-response time, each measured
+    in a fresh interpreter. ``mongo_url`` lets you include an unreachable or
+    slow MongoDB in the measurement."""
+    env = dict(os.environ, MONGO_URL=mongo_url or "")
+    imports, firsts = [], []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", _COLD_START_PROBE], cwd=HERE, env=env,
+                             capture_output=True, text=True, check=True).stdout.split()
+        imports.append(float(out[-2]))
+        firsts.append(float(out[-1]))
+    imports.sort()
+    firsts.sort()
+    return {"repeats": repeats, "mongo_url_set": bool(mongo_url),
+            "import_seconds_median": round(imports[len(imports) // 2], 4),
+            "first_response_seconds_median": round(firsts[len(firsts) // 2], 4)}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline /chat latency benchmark.")
+    parser.add_argument("--sizes", type=_int_list, default=[50, 1000, 10000, 100000])
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--mix", type=lambda v: [float(x) for x in v.split(",")], default=[0.1, 0.6, 0.2, 0.1],
+                        help="weights for rule,faq,ai,fallback questions")
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--answer-cache-size", type=int, default=0,
+                        help="ANSWER_CACHE_SIZE for the run (0 = every AI question reaches the stub)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--cold-start", type=int, metavar="N", default=0,
+                        help="instead of the load test, measure cold start over N fresh processes")
+    parser.add_argument("--cold-start-mongo-url", default="",
+                        help="MONGO_URL for --cold-start (e.g. an unreachable host to measure the blocking ping)")
+    parser.add_argument("--spell-report", action="store_true",
+                        help="instead of the load test, count sources moved by spelling correction")
+    parser.add_argument("--typo-rate", type=float, default=0.3,
+                        help="fraction of --spell-report questions given one misspelling")
+    args = parser.parse_args(argv)
+
+    if args.cold_start:
+        report = cold_start(args.cold_start, args.cold_start_mongo_url)
+        print(json.dumps(report, indent=2))
+        return 0
+
+    os.environ["ANSWER_CACHE_SIZE"] = str(args.answer_cache_size)
+    results = spell_report(args) if args.spell_report else asyncio.run(run(args))
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k != "out"},
+        "runs": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Wrote {len(results)} runs to {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
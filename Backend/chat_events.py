@@ -0,0 +1,101 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from metrics import current_timings, registry
+
+events_written_total = registry.counter("chat_events_written_total", "Chat events flushed to the event sink.")
+events_dropped_total = registry.counter(
+    "chat_events_dropped_total", "Chat events discarded (buffer_full, sink_error, no_sink).", ["reason"])
+
+# Best FAQ score seen while resolving the current question (set by the matcher).
+_faq_score = ContextVar("faq_score", default=None)
+
+
+def note_faq_score(score):
+    _faq_score.set(score)
+
+
+# -----------------------------
+# Bounded in-process buffer
+# -----------------------------
+class ChatEventLog:
+    """Ring buffer of chat resolutions, flushed in batches by a background task.
+
+    ``record`` is called on the request path and only appends to a bounded
+    deque; when the buffer is full the oldest event is overwritten and counted
+    in chat_events_dropped_total{reason="buffer_full"}. ``run`` drains the
+    buffer every ``flush_interval`` seconds in batches of ``batch_size``
+    through an async ``sink(batch)``.
+    """
+
+    def __init__(self, capacity=10000, batch_size=500, flush_interval=2.0):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=max(capacity, 1))
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def record(self, question, source, started_ns, faq_score=None, tenant=None):
+        score = _faq_score.get() if faq_score is None else faq_score
+        _faq_score.set(None)
+        if self.capacity <= 0:
+            return
+        timings = current_timings() or ()
+        event = {
+            "ts": datetime.now(timezone.utc),
+            "question": question,
+            "source": source,
+            "faq_score": score,
+            "stages_ms": {name: round(seconds * 1e3, 3) for name, seconds in timings},
+            "total_ms": round((time.perf_counter_ns() - started_ns) / 1e6, 3),
+        }
+        if tenant is not None:
+            event["tenant"] = tenant
+        if len(self._buffer) == self._buffer.maxlen:
+            events_dropped_total.labels("buffer_full").inc()
+        self._buffer.append(event)
+
+    def _take(self):
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    async def flush(self, sink):
+        while self._buffer:
+            batch = self._take()
+            if sink is None:
+                events_dropped_total.labels("no_sink").inc(len(batch))
+                continue
+            try:
+                await sink(batch)
+            except Exception as e:
+                events_dropped_total.labels("sink_error").inc(len(batch))
+                logging.warning("Dropped %d chat events: %s", len(batch), e)
+                return
+            events_written_total.labels().inc(len(batch))
+
+    async def run(self, get_sink):
+        """Flush forever; ``get_sink()`` is re-evaluated each round so the sink
+        can change (e.g. JSONL until MongoDB connects)."""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush(get_sink())
+        finally:
+            await self.flush(get_sink())
+
+
+# -----------------------------
+# Sinks
+# -----------------------------
+def append_jsonl(path, batch):
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(event, default=str) + "\n" for event in batch)
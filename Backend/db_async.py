@@ -0,0 +1,111 @@
+import os
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, AsyncMongoClient
+import certifi
+
+# -----------------------------
+# Connection pool settings
+# -----------------------------
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "60000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+
+FAQ_PROJECTION = {"question": 1, "answer": 1}
+
+
+def create_async_client(url: str) -> AsyncMongoClient:
+    kwargs = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    }
+    if "mongodb+srv" in url:
+        kwargs["tlsCAFile"] = certifi.where()
+    return AsyncMongoClient(url, **kwargs)
+
+
+def serialize_faq(doc, doc_id=None):
+    return {
+        "id": str(doc["_id"]) if doc_id is None else doc_id,
+        "question": doc.get("question", ""),
+        "answer": doc.get("answer", ""),
+    }
+
+
+# -----------------------------
+# FAQ stores
+# -----------------------------
+class AsyncFaqStore:
+    """Keyset-paginated / streaming reads of the ``faqs`` collection (async client)."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def _query(self, after):
+        if not after:
+            return {}
+        try:
+            return {"_id": {"$gt": ObjectId(after)}}
+        except InvalidId:
+            raise ValueError(f"invalid cursor: {after!r}")
+
+    async def page(self, after=None, limit=100):
+        """Return (faqs, next_after); next_after is None on the last page."""
+        cursor = (self.collection.find(self._query(after), FAQ_PROJECTION)
+                  .sort("_id", ASCENDING).limit(limit + 1))
+        docs = [serialize_faq(doc) async for doc in cursor]
+        if len(docs) > limit:
+            return docs[:limit], docs[limit - 1]["id"]
+        return docs, None
+
+    def stream(self, after=None, batch_size=500):
+        """Async iterator of serialized FAQs; the cursor is validated eagerly."""
+        query = self._query(after)
+
+        async def documents():
+            cursor = (self.collection.find(query, FAQ_PROJECTION)
+                      .sort("_id", ASCENDING).batch_size(batch_size))
+            async for doc in cursor:
+                yield serialize_faq(doc)
+        return documents()
+
+
+class SnapshotFaqStore:
+    """Same interface over the in-process FAQ corpus, for the in-memory fallback.
+    Documents there have no ObjectIds, so their position is used as the id."""
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+
+    def _start(self, after):
+        if not after:
+            return 0
+        if not after.isdigit():
+            raise ValueError(f"invalid cursor: {after!r}")
+        return int(after) + 1
+
+    async def page(self, after=None, limit=100):
+        snapshot = self.corpus.snapshot()
+        start = self._start(after)
+        end = min(start + limit, len(snapshot))
+        docs = [serialize_faq(snapshot.doc(i), str(i)) for i in range(start, end)]
+        return docs, (str(end - 1) if end < len(snapshot) else None)
+
+    def stream(self, after=None, batch_size=500):
+        start = self._start(after)
+        snapshot = self.corpus.snapshot()
+
+        async def documents():
+            for i in range(start, len(snapshot)):
+                yield serialize_faq(snapshot.doc(i), str(i))
+        return documents()
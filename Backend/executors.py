@@ -0,0 +1,45 @@
+import concurrent.futures
+import multiprocessing
+import threading
+
+
+class _Tracked:
+    """Executor mixin counting submitted-but-unfinished tasks for metrics."""
+
+    def _init_tracking(self, size):
+        self.size = size
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def inflight(self):
+        return self._inflight
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._inflight_lock:
+            self._inflight += 1
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future):
+        with self._inflight_lock:
+            self._inflight -= 1
+
+
+class ThreadPool(_Tracked, concurrent.futures.ThreadPoolExecutor):
+    def __init__(self, size, name):
+        concurrent.futures.ThreadPoolExecutor.__init__(self, max_workers=size, thread_name_prefix=name)
+        self._init_tracking(size)
+
+
+class ProcessPool(_Tracked, concurrent.futures.ProcessPoolExecutor):
+    # "spawn": workers must not inherit the server's threads, locks or sockets.
+    def __init__(self, size):
+        concurrent.futures.ProcessPoolExecutor.__init__(
+            self, max_workers=size, mp_context=multiprocessing.get_context("spawn"))
+        self._init_tracking(size)
@@ -0,0 +1,373 @@
+import bisect
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+import faq_snapshot
+from faq_index import NgramIndex
+from text_utils import normalize_text
+
+FAQ_SCORE_THRESHOLD = 70
+PREFIX_BONUS = 5
+
+# Below this size an exhaustive extractOne is exact and already sub-millisecond;
+# above it a TF-IDF shortlist of SHORTLIST_SIZE candidates is re-ranked instead.
+INDEX_MIN_SIZE = 2000
+SHORTLIST_SIZE = 64
+# Queries that prefix more questions than this (e.g. "who is") only get the
+# prefix bonus for shortlisted candidates, keeping latency independent of N.
+PREFIX_SCAN_LIMIT = 2048
+# Queries scored per cdist / cpdist call in best_matches.
+BATCH_CHUNK_SIZE = 256
+
+# Document in the faqs_meta collection whose "version" is bumped by ingest_faqs.py.
+CORPUS_META_ID = "faqs"
+
+# Normalized text only contains [a-z0-9 ], so this sorts after every continuation.
+_PREFIX_SENTINEL = "\x7f"
+
+
+def _sequence_nbytes(seq):
+    if hasattr(seq, "nbytes"):  # NumPy array or faq_snapshot.StringTable
+        return seq.nbytes
+    return sys.getsizeof(seq) + sum(map(sys.getsizeof, seq))
+
+
+# -----------------------------
+# Immutable corpus snapshot
+# -----------------------------
+class FaqSnapshot:
+    """One loaded version of the FAQ collection, stored as parallel arrays.
+
+    ``raw_questions`` and ``answers`` only need indexing, so a snapshot read
+    from disk can keep them as lazily decoded, memory-mapped tables.
+    """
+
+    def __init__(self, version, questions, raw_questions, answers, etag, sorted_ids=None, index=None):
+        self.version = version
+        self.questions = questions          # normalized, used for matching
+        self.raw_questions = raw_questions  # as stored, used for logging / responses
+        self.answers = answers
+        self.etag = etag
+
+        if sorted_ids is None:
+            sorted_ids = sorted(range(len(questions)), key=questions.__getitem__)
+        self._sorted_questions = [questions[i] for i in sorted_ids]
+        self._sorted_ids = sorted_ids
+        if index is None and len(questions) >= INDEX_MIN_SIZE:
+            index = NgramIndex(questions)
+        self.index = index
+        self._nbytes = None
+
+    @classmethod
+    def from_docs(cls, version, docs):
+        questions, raw_questions, answers = [], [], []
+        digest = hashlib.blake2b(digest_size=12)
+        for doc in docs:
+            raw_questions.append(doc.get("question", ""))
+            questions.append(normalize_text(doc.get("question", "")))
+            answers.append(doc.get("answer", "No answer found."))
+            digest.update(f"{raw_questions[-1]}\0{answers[-1]}\0".encode())
+        # Content hash: identical across workers/restarts for the same corpus.
+        return cls(version, questions, raw_questions, answers, digest.hexdigest())
+
+    def __len__(self):
+        return len(self.questions)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by this snapshot (strings, id lists, index),
+        counting memory-mapped sections at their mapped size. Computed once."""
+        if self._nbytes is None:
+            total = sum(_sequence_nbytes(seq) for seq in (self.questions, self.raw_questions, self.answers))
+            # _sorted_questions shares its strings with questions.
+            total += sys.getsizeof(self._sorted_questions) + _sequence_nbytes(self._sorted_ids)
+            if self.index is not None:
+                total += self.index.nbytes
+            self._nbytes = total
+        return self._nbytes
+
+    def doc(self, idx):
+        return {"question": self.raw_questions[idx], "answer": self.answers[idx]}
+
+    def _prefix_range(self, user_q):
+        lo = bisect.bisect_left(self._sorted_questions, user_q)
+        hi = bisect.bisect_left(self._sorted_questions, user_q + _PREFIX_SENTINEL, lo)
+        return lo, hi
+
+    def _prefix_ids(self, user_q, candidates=None):
+        """Indices of questions starting with ``user_q`` (restricted to
+        ``candidates`` when the full range exceeds PREFIX_SCAN_LIMIT)."""
+        lo, hi = self._prefix_range(user_q)
+        if hi - lo > PREFIX_SCAN_LIMIT and candidates is not None:
+            return [i for i in candidates if self.questions[i].startswith(user_q)]
+        return self._sorted_ids[lo:hi]
+
+    def best_match(self, user_q, threshold=FAQ_SCORE_THRESHOLD):
+        """Return (index, score) of the best FAQ for a normalized query, or None.
+
+        Scores are token_sort_ratio plus PREFIX_BONUS when the FAQ question starts
+        with the query, exactly as the original per-request loop computed them.
+        """
+        if not self.questions or not user_q:
+            return None
+
+        if self.index is None:
+            candidates = None
+            choices = self.questions
+        else:
+            candidates = self.index.top_k(user_q, SHORTLIST_SIZE).tolist()
+            choices = [self.questions[i] for i in candidates]
+
+        best_idx, best_score = -1, -1
+        hit = process.extractOne(user_q, choices, scorer=fuzz.token_sort_ratio,
+                                 score_cutoff=max(threshold - PREFIX_BONUS, 0))
+        if hit:
+            _, best_score, best_idx = hit
+            if candidates is not None:
+                best_idx = candidates[best_idx]
+
+        prefixed = self._prefix_ids(user_q, candidates)
+        if prefixed:
+            prefix_choices = [self.questions[i] for i in prefixed]
+            hit = process.extractOne(user_q, prefix_choices, scorer=fuzz.token_sort_ratio)
+            if hit and hit[1] + PREFIX_BONUS > best_score:
+                best_score = hit[1] + PREFIX_BONUS
+                best_idx = prefixed[hit[2]]
+
+        if best_score >= threshold:
+            return best_idx, best_score
+        return None
+
+    def best_matches(self, user_qs, threshold=FAQ_SCORE_THRESHOLD, workers=-1):
+        """Batch form of ``best_match`` with identical results, computed on
+        ``workers`` threads outside the GIL. Unindexed corpora get one
+        ``cdist`` score matrix per chunk of queries; indexed ones score only
+        each query's own shortlist and prefix candidates with ``cpdist``."""
+        results = [None] * len(user_qs)
+        live = [i for i, q in enumerate(user_qs) if q]
+        if not self.questions:
+            return results
+
+        for start in range(0, len(live), BATCH_CHUNK_SIZE):
+            rows = live[start:start + BATCH_CHUNK_SIZE]
+            queries = [user_qs[i] for i in rows]
+            if self.index is None:
+                scores = process.cdist(queries, self.questions, scorer=fuzz.token_sort_ratio,
+                                       dtype=np.float64, workers=workers)
+                for row, q in enumerate(queries):
+                    prefixed = self._prefix_ids(q)
+                    results[rows[row]] = _pick(None, scores[row], prefixed, scores[row, prefixed], threshold)
+                continue
+
+            shortlists = [self.index.top_k(q, SHORTLIST_SIZE).tolist() for q in queries]
+            prefixes = [self._prefix_ids(q, shortlist) for q, shortlist in zip(queries, shortlists)]
+            pair_queries, pair_choices = [], []
+            for q, shortlist, prefixed in zip(queries, shortlists, prefixes):
+                pair_queries.extend([q] * (len(shortlist) + len(prefixed)))
+                pair_choices.extend(self.questions[i] for i in shortlist)
+                pair_choices.extend(self.questions[i] for i in prefixed)
+            if not pair_queries:
+                continue
+            scores = process.cpdist(pair_queries, pair_choices, scorer=fuzz.token_sort_ratio,
+                                    dtype=np.float64, workers=workers)
+
+            offset = 0
+            for row, (shortlist, prefixed) in enumerate(zip(shortlists, prefixes)):
+                middle, end = offset + len(shortlist), offset + len(shortlist) + len(prefixed)
+                results[rows[row]] = _pick(shortlist, scores[offset:middle], prefixed, scores[middle:end], threshold)
+                offset = end
+        return results
+
+
+def _pick(candidates, scores, prefixed, prefix_scores, threshold):
+    """``best_match``'s selection over precomputed token_sort_ratio scores:
+    the first best candidate, replaced by a prefixed one only when its score
+    plus PREFIX_BONUS is strictly higher. ``candidates=None`` means the scores
+    cover every question in order."""
+    best_idx, best_score = -1, -1
+    if len(scores):
+        col = int(np.argmax(scores))  # first maximum, as extractOne returns
+        if scores[col] >= max(threshold - PREFIX_BONUS, 0):
+            best_idx = col if candidates is None else candidates[col]
+            best_score = float(scores[col])
+    if len(prefixed):
+        col = int(np.argmax(prefix_scores))
+        if prefix_scores[col] + PREFIX_BONUS > best_score:
+            best_idx, best_score = prefixed[col], float(prefix_scores[col]) + PREFIX_BONUS
+    if best_score >= threshold:
+        return best_idx, best_score
+    return None
+
+
+# -----------------------------
+# Versioned, self-refreshing corpus
+# -----------------------------
+class FaqCorpus:
+    """Loads the FAQ collection once and reloads it only when the collection changes.
+
+    Changes are detected with a MongoDB change stream when the collection supports
+    one, otherwise by polling a cheap fingerprint (document count, latest
+    ``updatedAt`` and the corpus version in ``meta``, when given). Anything with ``find`` and ``count_documents`` works, including
+    the ``InMemoryCollection`` fallback.
+
+    With ``snapshot_path`` every successful load is also written to disk (see
+    faq_snapshot.py). While there is no collection yet (``collection=None``,
+    e.g. MongoDB still connecting) or the first load fails, the corpus is
+    served from that file instead, and ``attach()`` reconciles it later.
+    """
+
+    def __init__(self, collection, poll_interval=30.0, meta=None, snapshot_path=None):
+        self.collection = collection
+        self.meta = meta
+        self.poll_interval = poll_interval
+        self.snapshot_path = snapshot_path
+        self.source = None  # "collection" or "file" once loaded
+        self._snapshot = None
+        self._fingerprint = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stream = None
+        self._closed = False
+
+    def snapshot(self) -> FaqSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._load_locked()
+                self._start_watcher_locked()
+            snap = self._snapshot
+        return snap
+
+    @property
+    def loaded(self):
+        return self._snapshot is not None
+
+    def refresh(self):
+        with self._lock:
+            self._load_locked()
+
+    def attach(self, collection, meta=None):
+        """Switch to another source (e.g. MongoDB once it is reachable) and reload."""
+        with self._lock:
+            self.collection = collection
+            self.meta = meta
+            self._load_locked()
+            self._start_watcher_locked()
+
+    def close(self):
+        """Stop watching for changes; the loaded snapshot stays usable."""
+        self._closed = True
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception as e:
+                logging.debug("Closing FAQ change stream: %s", e)
+
+    # -- loading -------------------------------------------------------------
+    def _fetch_fingerprint(self):
+        count = self.collection.count_documents({})
+        latest = None
+        if hasattr(self.collection, "find_one"):
+            doc = self.collection.find_one({}, {"updatedAt": 1}, sort=[("updatedAt", -1)])
+            latest = doc.get("updatedAt") if doc else None
+        version = None
+        if self.meta is not None:
+            doc = self.meta.find_one({"_id": CORPUS_META_ID})
+            version = doc.get("version") if doc else None
+        return count, latest, version
+
+    def _load_locked(self):
+        if self.collection is None:
+            if self._snapshot is None:
+                self._load_file_locked()
+            return
+        try:
+            fingerprint = self._fetch_fingerprint()
+            docs = self.collection.find({}, {"question": 1, "answer": 1})
+            snap = FaqSnapshot.from_docs(self._version + 1, docs)
+        except Exception as e:
+            logging.exception("Error loading FAQ corpus: %s", e)
+            if self._snapshot is None:
+                self._load_file_locked()
+            return
+
+        self._fingerprint = fingerprint
+        self.source = "collection"
+        if self._snapshot is not None and snap.etag == self._snapshot.etag:
+            # Same content (e.g. the file we started from): keep the version.
+            return
+        self._version = snap.version
+        self._snapshot = snap
+        logging.info("Loaded FAQ corpus v%d (%d entries).", snap.version, len(snap))
+        self._persist_locked(snap)
+
+    def _persist_locked(self, snap):
+        if not self.snapshot_path:
+            return
+        try:
+            faq_snapshot.write_snapshot(self.snapshot_path, snap)
+        except Exception as e:
+            logging.warning("Could not write FAQ snapshot %s: %s", self.snapshot_path, e)
+
+    def _load_file_locked(self):
+        snap = None
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            try:
+                snap = faq_snapshot.read_snapshot(self.snapshot_path)
+            except Exception as e:
+                logging.warning("Ignoring unreadable FAQ snapshot %s: %s", self.snapshot_path, e)
+        if snap is None:
+            self._snapshot = FaqSnapshot.from_docs(self._version, [])
+            return
+        self._version = snap.version
+        self._snapshot = snap
+        self.source = "file"
+        logging.info("Loaded FAQ corpus v%d (%d entries) from %s.", snap.version, len(snap), self.snapshot_path)
+
+    # -- change detection ------------------------------------------------------
+    def _start_watcher_locked(self):
+        if self._watcher is None and self.collection is not None and not self._closed:
+            self._watcher = threading.Thread(target=self._watch, name="faq-corpus-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while not self._closed:
+            collection = self.collection
+            if hasattr(collection, "watch"):
+                try:
+                    with collection.watch() as stream:
+                        self._stream = stream
+                        for _ in stream:
+                            # Coalesce bursts (bulk ingestion) into a single reload.
+                            while stream.try_next() is not None:
+                                pass
+                            self.refresh()
+                except Exception as e:
+                    if self._closed:
+                        return
+                    logging.info("FAQ change stream unavailable (%s); polling every %ss.", e, self.poll_interval)
+                finally:
+                    self._stream = None
+
+            # Poll until attach() switches the source, then re-evaluate.
+            while self.collection is collection and not self._closed:
+                time.sleep(self.poll_interval)
+                if self._closed:
+                    return
+                try:
+                    changed = self._fetch_fingerprint() != self._fingerprint
+                except Exception as e:
+                    logging.warning("FAQ corpus poll failed: %s", e)
+                    continue
+                if changed:
+                    self.refresh()
@@ -0,0 +1,120 @@
+import math
+import sys
+from collections import Counter
+
+import numpy as np
+
+NGRAM_SIZE = 3
+# n-grams present in more than this fraction of documents carry almost no
+# ranking signal but have O(N) postings; they are skipped at query time.
+MAX_DF_RATIO = 0.05
+
+
+# -----------------------------
+# Character n-gram extraction
+# -----------------------------
+def _ngrams(text: str):
+    """Character n-grams taken per token, so word order does not matter
+    (mirrors token_sort_ratio, which the re-ranking stage uses)."""
+    grams = Counter()
+    for token in text.split():
+        padded = f" {token} "
+        for i in range(max(1, len(padded) - NGRAM_SIZE + 1)):
+            grams[padded[i:i + NGRAM_SIZE]] += 1
+    return grams
+
+
+def _strings_nbytes(strings):
+    return sys.getsizeof(strings) + sum(map(sys.getsizeof, strings))
+
+
+# -----------------------------
+# Sparse TF-IDF candidate index
+# -----------------------------
+class NgramIndex:
+    """Inverted char-n-gram TF-IDF index stored as CSR-style NumPy arrays.
+
+    ``postings_docs[indptr[g]:indptr[g + 1]]`` lists the documents containing
+    n-gram ``g`` and ``postings_weights`` the matching L2-normalized weights, so
+    scoring a query is one ``bincount`` over the concatenated postings of its
+    n-grams instead of a Python loop over every document.
+    """
+
+    def __init__(self, texts):
+        self.size = len(texts)
+        self.vocab = {}
+        doc_ids, gram_ids, counts = [], [], []
+        for doc_id, text in enumerate(texts):
+            for gram, count in _ngrams(text).items():
+                gram_id = self.vocab.setdefault(gram, len(self.vocab))
+                doc_ids.append(doc_id)
+                gram_ids.append(gram_id)
+                counts.append(count)
+
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        gram_ids = np.asarray(gram_ids, dtype=np.int32)
+        tf = 1.0 + np.log(np.asarray(counts, dtype=np.float32))
+
+        df = np.bincount(gram_ids, minlength=len(self.vocab)).astype(np.float32)
+        self.idf = (np.log((self.size + 1) / (df + 1)) + 1.0).astype(np.float32)
+
+        weights = tf * self.idf[gram_ids]
+        norms = np.sqrt(np.bincount(doc_ids, weights=weights * weights, minlength=self.size))
+        norms[norms == 0] = 1.0
+        weights = (weights / norms[doc_ids]).astype(np.float32)
+
+        order = np.argsort(gram_ids, kind="stable")
+        self.postings_docs = doc_ids[order]
+        self.postings_weights = weights[order]
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df.astype(np.int64), out=self.indptr[1:])
+        self.max_postings = max(64, int(self.size * MAX_DF_RATIO))
+
+    @classmethod
+    def from_arrays(cls, size, grams, idf, indptr, postings_docs, postings_weights):
+        """Rebuild an index from previously computed arrays (e.g. mmap'd views);
+        ``grams`` lists the vocabulary in n-gram id order."""
+        index = cls.__new__(cls)
+        index.size = size
+        index.vocab = {gram: gram_id for gram_id, gram in enumerate(grams)}
+        index.idf = idf
+        index.indptr = indptr
+        index.postings_docs = postings_docs
+        index.postings_weights = postings_weights
+        index.max_postings = max(64, int(size * MAX_DF_RATIO))
+        return index
+
+    @property
+    def nbytes(self):
+        arrays = (self.idf, self.indptr, self.postings_docs, self.postings_weights)
+        return sum(a.nbytes for a in arrays) + _strings_nbytes(self.vocab)
+
+    def top_k(self, query: str, k: int):
+        """Indices of the ``k`` documents most similar to ``query``, best first."""
+        grams = []
+        for gram, count in _ngrams(query).items():
+            gram_id = self.vocab.get(gram)
+            if gram_id is not None:
+                grams.append((self.indptr[gram_id + 1] - self.indptr[gram_id], gram_id, count))
+        selective = [g for g in grams if g[0] <= self.max_postings]
+        if not selective and grams:
+            # Only stop-grams matched: fall back to the rarest one.
+            selective = [min(grams)]
+
+        doc_chunks, weight_chunks = [], []
+        for _, gram_id, count in selective:
+            start, end = self.indptr[gram_id], self.indptr[gram_id + 1]
+            doc_chunks.append(self.postings_docs[start:end])
+            weight_chunks.append(self.postings_weights[start:end] * ((1.0 + math.log(count)) * self.idf[gram_id]))
+
+        if not doc_chunks:
+            return np.empty(0, dtype=np.int64)
+
+        scores = np.bincount(np.concatenate(doc_chunks), weights=np.concatenate(weight_chunks),
+                             minlength=self.size)
+        hits = np.count_nonzero(scores)
+        if hits <= k:
+            top = np.flatnonzero(scores)
+        else:
+            top = np.argpartition(-scores, k)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
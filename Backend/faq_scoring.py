@@ -0,0 +1,163 @@
+"""FAQ scoring off the event loop, on its own executors.
+
+Batches always run on a small dedicated thread pool (rapidfuzz ``cdist``
+releases the GIL and fans out over ``batch_workers`` cores), so they never
+occupy the I/O threads used for MongoDB and file writes. With ``processes``
+> 0, corpora of at least ``min_size`` FAQs are instead scored by a process
+pool: single questions as well as batches, split across the processes. The
+workers memory-map the snapshot from an immutable file in the faq_snapshot
+format rather than receiving the corpus by pickle. That file is a shared
+generation file when the corpus comes from faq_shared.py, otherwise a spill
+file written once per corpus version.
+"""
+import asyncio
+import functools
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import faq_snapshot
+from executors import ProcessPool, ThreadPool
+
+# Snapshots kept mapped per worker process, and spill files kept on disk; more
+# than one so that several large tenant corpora do not evict each other.
+WORKER_SNAPSHOTS = 4
+MAX_SPILL_FILES = 8
+
+# -----------------------------
+# Worker process side
+# -----------------------------
+_worker_snapshots = OrderedDict()  # path -> FaqSnapshot, LRU
+
+
+def _worker_snapshot(path):
+    snap = _worker_snapshots.get(path)
+    if snap is None:
+        snap = _worker_snapshots[path] = faq_snapshot.read_snapshot(path)
+        while len(_worker_snapshots) > WORKER_SNAPSHOTS:
+            _worker_snapshots.popitem(last=False)
+    else:
+        _worker_snapshots.move_to_end(path)
+    return snap
+
+
+def _match_one(path, query, threshold):
+    return _worker_snapshot(path).best_match(query, threshold)
+
+
+def _match_many(path, queries, threshold):
+    # One core per process; the pool provides the parallelism.
+    return _worker_snapshot(path).best_matches(queries, threshold, workers=1)
+
+
+# -----------------------------
+# Server side
+# -----------------------------
+class FaqScorer:
+    def __init__(self, threads=2, processes=0, min_size=20000, batch_workers=-1, spill_dir=None):
+        self.thread_count = threads
+        self.process_count = processes
+        self.min_size = min_size
+        self.batch_workers = batch_workers
+        self.spill_dir = spill_dir or tempfile.gettempdir()
+        self._threads = None
+        self._processes = None
+        self._spilled = OrderedDict()  # etag -> spill file path, LRU
+        self._lock = threading.Lock()
+
+    # Pools are created on first use and dropped by close(), so the scorer
+    # survives several app lifespans in one process (tests, benchmarks).
+    def _thread_pool(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPool(self.thread_count, "faq-score")
+            return self._threads
+
+    def _process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPool(self.process_count)
+            return self._processes
+
+    def uses_processes(self, snapshot):
+        return self.process_count > 0 and len(snapshot) >= self.min_size
+
+    def start(self):
+        """Spawn the worker processes ahead of the first large query."""
+        if self.process_count > 0:
+            pool = self._process_pool()
+            for _ in range(self.process_count):
+                pool.submit(os.getpid)
+
+    def close(self):
+        with self._lock:
+            threads, processes, self._threads, self._processes = self._threads, self._processes, None, None
+            spilled, self._spilled = self._spilled, OrderedDict()
+        if threads is not None:
+            threads.shutdown(wait=False)
+        if processes is not None:
+            processes.shutdown(wait=False, cancel_futures=True)
+        for path in spilled.values():
+            self._remove(path)
+
+    def stats(self):
+        """{pool: (workers, in-flight tasks)} for metrics."""
+        threads, processes = self._threads, self._processes
+        return {
+            "faq_threads": (self.thread_count, threads.inflight if threads else 0),
+            "faq_processes": (self.process_count, processes.inflight if processes else 0),
+        }
+
+    # -- snapshot files for the worker processes --------------------------------
+    def _path_for(self, snapshot):
+        shared = getattr(snapshot, "shared_path", None)
+        if shared:
+            return shared
+        with self._lock:
+            path = self._spilled.get(snapshot.etag)
+            if path is None:
+                path = os.path.join(self.spill_dir, f"faq-scoring-{os.getpid()}-{snapshot.etag}.bin")
+                faq_snapshot.write_snapshot(path, snapshot)
+                self._spilled[snapshot.etag] = path
+                while len(self._spilled) > MAX_SPILL_FILES:
+                    self._remove(self._spilled.popitem(last=False)[1])
+            else:
+                self._spilled.move_to_end(snapshot.etag)
+        return path
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.debug("Could not remove %s: %s", path, e)
+
+    # -- scoring -------------------------------------------------------------------
+    async def best_match(self, snapshot, query, threshold):
+        if self.uses_processes(snapshot):
+            loop = asyncio.get_running_loop()
+            try:
+                path = await loop.run_in_executor(self._thread_pool(), self._path_for, snapshot)
+                return await loop.run_in_executor(self._process_pool(), _match_one, path, query, threshold)
+            except Exception as e:
+                logging.warning("FAQ scoring process failed (%s); scoring in-process.", e)
+        return snapshot.best_match(query, threshold)
+
+    async def best_matches(self, snapshot, queries, threshold):
+        loop = asyncio.get_running_loop()
+        if self.uses_processes(snapshot):
+            try:
+                path = await loop.run_in_executor(self._thread_pool(), self._path_for, snapshot)
+                pool = self._process_pool()
+                chunk = max(1, -(-len(queries) // self.process_count))
+                parts = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _match_many, path, queries[i:i + chunk], threshold)
+                    for i in range(0, len(queries), chunk)
+                ))
+                return [match for part in parts for match in part]
+            except Exception as e:
+                logging.warning("FAQ scoring processes failed (%s); scoring in-process.", e)
+        score = functools.partial(snapshot.best_matches, queries, threshold, workers=self.batch_workers)
+        return await loop.run_in_executor(self._thread_pool(), score)
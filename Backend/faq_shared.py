@@ -0,0 +1,154 @@
+"""FAQ corpus shared by several worker processes (``uvicorn --workers N``).
+
+All workers point at one directory. The worker holding ``loader.lock`` is the
+loader: it reads MongoDB like a plain FaqCorpus and publishes every new version
+as an immutable generation file ``faq-<n>.bin`` (faq_snapshot.py format), then
+atomically replaces the ``CURRENT`` pointer. Every worker, the loader included,
+serves the generation named by ``CURRENT`` through a read-only mmap. Index
+arrays, raw questions and answers therefore live once in the page cache. Only
+the normalized question list and the n-gram vocabulary are decoded per worker.
+
+Followers never query the FAQ collection; they re-read ``CURRENT`` every
+``follow_interval`` seconds, so all workers switch to a new generation within
+that window. If the loader exits, its lock is released and the next follower
+to poll takes over.
+"""
+import logging
+import os
+import threading
+import time
+
+import faq_snapshot
+from faq_corpus import FaqCorpus
+
+POINTER_FILE = "CURRENT"
+LOCK_FILE = "loader.lock"
+# Older generations kept for followers that have not switched yet.
+KEEP_GENERATIONS = 2
+
+
+def _try_lock(path):
+    """Non-blocking exclusive lock held for the life of the returned file."""
+    f = open(path, "a+b")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def _generation_name(generation):
+    return f"faq-{generation:08d}.bin"
+
+
+class SharedFaqCorpus(FaqCorpus):
+    def __init__(self, collection, directory, poll_interval=30.0, meta=None, follow_interval=0.5):
+        super().__init__(collection, poll_interval=poll_interval, meta=meta)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.follow_interval = follow_interval
+        self.generation = None  # file name of the mapped generation
+        self._lock_file = None
+        self._follower = None
+
+    @property
+    def is_loader(self):
+        return self._lock_file is not None
+
+    def _acquire_loader(self):
+        if self._lock_file is None:
+            self._lock_file = _try_lock(os.path.join(self.directory, LOCK_FILE))
+            if self._lock_file is not None:
+                logging.info("This worker (pid %d) is the FAQ corpus loader.", os.getpid())
+        return self.is_loader
+
+    # -- generations -------------------------------------------------------------
+    def _current_generation(self):
+        try:
+            with open(os.path.join(self.directory, POINTER_FILE), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _map_generation_locked(self, name):
+        snap = faq_snapshot.read_snapshot(os.path.join(self.directory, name))
+        snap.shared_path = os.path.join(self.directory, name)  # immutable: faq_scoring workers map it too
+        self._version = snap.version
+        self._snapshot = snap
+        self.generation = name
+        logging.info("Serving FAQ corpus v%d (%d entries) from shared %s.", snap.version, len(snap), name)
+
+    def _publish_locked(self, snap):
+        current = self._current_generation()
+        generation = int(current[len("faq-"):-len(".bin")]) + 1 if current else 1
+        name = _generation_name(generation)
+        faq_snapshot.write_snapshot(os.path.join(self.directory, name), snap)
+        pointer = os.path.join(self.directory, POINTER_FILE)
+        tmp = f"{pointer}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, pointer)
+        self._remove_old_generations(generation)
+        return name
+
+    def _remove_old_generations(self, generation):
+        keep = {_generation_name(g) for g in range(generation - KEEP_GENERATIONS, generation + 1)}
+        for name in os.listdir(self.directory):
+            if name.startswith("faq-") and name.endswith(".bin") and name not in keep:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass  # still mapped somewhere (Windows); retried on the next publish
+
+    # -- FaqCorpus hooks ---------------------------------------------------------
+    def _load_locked(self):
+        if self._acquire_loader():
+            super()._load_locked()
+        else:
+            self._load_file_locked()
+
+    def _load_file_locked(self):
+        name = self._current_generation()
+        if name is not None and name != self.generation:
+            try:
+                self._map_generation_locked(name)
+                self.source = "file"
+                return
+            except Exception as e:
+                logging.warning("Could not map FAQ generation %s: %s", name, e)
+        if self._snapshot is None:
+            super()._load_file_locked()
+
+    def _persist_locked(self, snap):
+        try:
+            self._map_generation_locked(self._publish_locked(snap))
+        except Exception as e:
+            logging.warning("Could not publish FAQ generation: %s", e)
+
+    def _start_watcher_locked(self):
+        if self.is_loader:
+            super()._start_watcher_locked()
+        if self._follower is None:
+            self._follower = threading.Thread(target=self._follow, name="faq-corpus-follower", daemon=True)
+            self._follower.start()
+
+    def _follow(self):
+        while not self.is_loader:
+            time.sleep(self.follow_interval)
+            with self._lock:
+                if self._acquire_loader():
+                    # Take over from a loader that exited.
+                    if self.collection is not None:
+                        super()._load_locked()
+                    super()._start_watcher_locked()
+                elif self._current_generation() != self.generation:
+                    self._load_file_locked()
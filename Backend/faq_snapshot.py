@@ -0,0 +1,156 @@
+"""Versioned, memory-mappable on-disk copy of a FaqSnapshot.
+
+Layout: MAGIC, a little-endian uint64 header length, a JSON header, then each
+array section aligned to SECTION_ALIGN bytes. The header maps section names to
+(offset, dtype, length), so loading is one ``mmap`` plus ``np.frombuffer`` views
+and nothing is parsed or re-indexed.
+
+Strings are stored as one UTF-8 blob plus int64 offsets. Questions are decoded
+eagerly because the matcher scans them; raw questions and answers are decoded
+only when a document is returned.
+"""
+import json
+import mmap
+import os
+
+import numpy as np
+
+from faq_index import NgramIndex
+
+MAGIC = b"FAQSNAP\0"
+FORMAT_VERSION = 1
+SECTION_ALIGN = 64
+
+
+class StringTable:
+    """Read-only sequence of strings backed by a UTF-8 blob and offsets."""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    @classmethod
+    def encode(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    @property
+    def nbytes(self):
+        return len(self._blob) + self._offsets.nbytes
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        start, end = self._offsets[idx], self._offsets[idx + 1]
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def tolist(self):
+        text = bytes(self._blob).decode("utf-8") if len(self._blob) else ""
+        # Offsets are byte positions; only pure-ASCII blobs can be sliced as str.
+        if len(text) == len(self._blob):
+            bounds = self._offsets.tolist()
+            return [text[bounds[i]:bounds[i + 1]] for i in range(len(self))]
+        return [self[i] for i in range(len(self))]
+
+
+# -----------------------------
+# Writing
+# -----------------------------
+def _sections(snap):
+    sections = {}
+    sections["questions"], sections["questions_offsets"] = StringTable.encode(snap.questions)
+    sections["raw_questions"], sections["raw_questions_offsets"] = StringTable.encode(snap.raw_questions)
+    sections["answers"], sections["answers_offsets"] = StringTable.encode(snap.answers)
+    sections["sorted_ids"] = np.asarray(snap._sorted_ids, dtype=np.int64)
+    index = snap.index
+    if index is not None:
+        grams = sorted(index.vocab, key=index.vocab.__getitem__)
+        sections["vocab"], sections["vocab_offsets"] = StringTable.encode(grams)
+        sections["idf"] = index.idf
+        sections["indptr"] = index.indptr
+        sections["postings_docs"] = index.postings_docs
+        sections["postings_weights"] = index.postings_weights
+    return sections
+
+
+def write_snapshot(path, snap):
+    """Write ``snap`` to ``path`` atomically (temp file + fsync + rename)."""
+    sections = _sections(snap)
+    header = {"format": FORMAT_VERSION, "version": snap.version, "etag": snap.etag,
+              "count": len(snap), "sections": {}}
+    # Offsets are relative to the end of the header, so they can be computed
+    # before the header's own size is known.
+    offset = 0
+    for name, array in sections.items():
+        offset = -(-offset // SECTION_ALIGN) * SECTION_ALIGN
+        header["sections"][name] = [offset, array.dtype.str, len(array)]
+        offset += array.nbytes
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // SECTION_ALIGN) * SECTION_ALIGN
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, array in sections.items():
+            f.seek(data_start + header["sections"][name][0])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)  # trailing empty sections still lie inside the file
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+def read_header(buffer):
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError("not a FAQ snapshot file")
+    size = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], "little")
+    start = len(MAGIC) + 8
+    header = json.loads(bytes(buffer[start:start + size]))
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"unsupported FAQ snapshot format {header.get('format')!r}")
+    header["data_start"] = -(-(start + size) // SECTION_ALIGN) * SECTION_ALIGN
+    return header
+
+
+def snapshot_from_buffer(buffer):
+    """Build a FaqSnapshot whose arrays are zero-copy views into ``buffer``."""
+    from faq_corpus import FaqSnapshot  # faq_corpus imports this module
+
+    header = read_header(buffer)
+
+    def section(name):
+        offset, dtype, length = header["sections"][name]
+        return np.frombuffer(buffer, dtype=np.dtype(dtype), count=length,
+                             offset=header["data_start"] + offset)
+
+    def strings(name):
+        return StringTable(section(name), section(name + "_offsets"))
+
+    index = None
+    if "indptr" in header["sections"]:
+        index = NgramIndex.from_arrays(
+            header["count"], strings("vocab").tolist(), section("idf"), section("indptr"),
+            section("postings_docs"), section("postings_weights"))
+    snap = FaqSnapshot(header["version"], strings("questions").tolist(), strings("raw_questions"),
+                       strings("answers"), header["etag"],
+                       sorted_ids=section("sorted_ids").tolist(), index=index)
+    # The views keep the mapping alive; this makes the dependency explicit.
+    snap.buffer = buffer
+    return snap
+
+
+def read_snapshot(path):
+    """Memory-map ``path`` and return the FaqSnapshot stored in it."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return snapshot_from_buffer(buffer)
@@ -0,0 +1,208 @@
+# ingest_faqs.py
+"""Incrementally sync FAQ files into MongoDB.
+
+Usage:
+    python ingest_faqs.py data/faqs.jsonl [more.csv more.yaml ...] [--dry-run] [--database chatbot_<tenant>]
+
+Each entry needs "question" and "answer" (and optionally a stable "key";
+otherwise the normalized question is the key). Only added, changed and
+removed entries are written, via batched bulk_write, so the live collection
+is never empty. Afterwards the corpus version in faqs_meta is bumped so
+running servers reload.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import certifi
+import yaml
+from dotenv import load_dotenv
+from pymongo import DeleteMany, MongoClient, ReturnDocument, UpdateOne
+
+from faq_corpus import CORPUS_META_ID
+from text_utils import normalize_text
+
+DEFAULT_BATCH_SIZE = 1000
+DIFF_SAMPLE_SIZE = 10
+
+
+# -----------------------------
+# Readers (streaming)
+# -----------------------------
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def _read_yaml(path):
+    # Multi-document YAML ("---" per entry) streams; a single top-level list
+    # (or {"faqs": [...]}) is loaded as one document.
+    with open(path, encoding="utf-8") as f:
+        for doc in yaml.safe_load_all(f):
+            if isinstance(doc, dict) and "faqs" in doc:
+                doc = doc["faqs"]
+            if isinstance(doc, list):
+                yield from doc
+            elif doc:
+                yield doc
+
+
+READERS = {".jsonl": _read_jsonl, ".ndjson": _read_jsonl, ".csv": _read_csv,
+           ".yaml": _read_yaml, ".yml": _read_yaml}
+
+
+def read_records(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f"Unsupported FAQ file type: {path}")
+    return READERS[ext](path)
+
+
+# -----------------------------
+# Content identity
+# -----------------------------
+def faq_key(record):
+    return record.get("key") or normalize_text(record.get("question", ""))
+
+
+def content_hash(question, answer):
+    return hashlib.sha1(json.dumps([question, answer], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# Sync
+# -----------------------------
+def sync_faqs(db, records, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, delete_missing=True):
+    """Apply the difference between ``records`` and ``db.faqs``; returns a report dict.
+
+    Only ``key -> (_id, hash)`` of the existing collection is held in memory;
+    input records are streamed and written in batches of ``batch_size``.
+    """
+    faqs = db["faqs"]
+    started = time.perf_counter()
+    report = {"added": 0, "changed": 0, "unchanged": 0, "deleted": 0, "skipped": 0,
+              "dry_run": dry_run, "samples": []}
+
+    existing = {}
+    for doc in faqs.find({}, {"key": 1, "question": 1, "answer": 1, "content_hash": 1}).batch_size(5000):
+        digest = doc.get("content_hash")
+        if digest is None or "key" not in doc:
+            digest = None  # legacy document: rewrite once to backfill key/hash
+        existing[doc.get("key") or normalize_text(doc.get("question", ""))] = (doc["_id"], digest)
+
+    if not dry_run:
+        faqs.create_index("key")
+
+    def sample(kind, key):
+        if len(report["samples"]) < DIFF_SAMPLE_SIZE:
+            report["samples"].append(f"{kind}: {key}")
+
+    ops = []
+    def flush():
+        if ops and not dry_run:
+            faqs.bulk_write(ops, ordered=False)
+        ops.clear()
+
+    seen = set()
+    now = datetime.now(timezone.utc)
+    for record in records:
+        question, answer = record.get("question"), record.get("answer")
+        key = faq_key(record)
+        if not question or not answer or not key or key in seen:
+            report["skipped"] += 1
+            continue
+        seen.add(key)
+
+        digest = content_hash(question, answer)
+        fields = {"key": key, "question": question, "answer": answer,
+                  "content_hash": digest, "updatedAt": now}
+        current = existing.get(key)
+        if current is None:
+            report["added"] += 1
+            sample("add", key)
+            ops.append(UpdateOne({"key": key}, {"$set": fields}, upsert=True))
+        elif current[1] != digest:
+            report["changed"] += 1
+            sample("change", key)
+            ops.append(UpdateOne({"_id": current[0]}, {"$set": fields}))
+        else:
+            report["unchanged"] += 1
+            continue
+        if len(ops) >= batch_size:
+            flush()
+    flush()
+
+    if delete_missing:
+        stale_keys = [key for key in existing if key not in seen]
+        stale = [existing[key][0] for key in stale_keys]
+        report["deleted"] = len(stale)
+        for key in stale_keys[:DIFF_SAMPLE_SIZE]:
+            sample("delete", key)
+        for i in range(0, len(stale), batch_size):
+            ops.append(DeleteMany({"_id": {"$in": stale[i:i + batch_size]}}))
+            flush()
+
+    if not dry_run and (report["added"] or report["changed"] or report["deleted"]):
+        meta = db["faqs_meta"].find_one_and_update(
+            {"_id": CORPUS_META_ID},
+            {"$inc": {"version": 1}, "$set": {"updatedAt": now}},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        report["version"] = meta.get("version") if meta else None
+
+    elapsed = time.perf_counter() - started
+    processed = report["added"] + report["changed"] + report["unchanged"] + report["skipped"]
+    report["seconds"] = round(elapsed, 3)
+    report["records_per_second"] = round(processed / elapsed) if elapsed > 0 else None
+    return report
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally sync FAQ files into MongoDB.")
+    parser.add_argument("files", nargs="+", help="JSONL / CSV / YAML files with question and answer fields")
+    parser.add_argument("--dry-run", action="store_true", help="only report the diff, write nothing")
+    parser.add_argument("--keep-missing", action="store_true", help="do not delete FAQs absent from the input")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--database", default="chatbot_db",
+                        help="target database; tenants use their own (see tenants.py)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    mongo_url = os.getenv("MONGO_URL")
+    if not mongo_url:
+        print("❌ MONGO_URL not found in .env file. Please set it before running this script.")
+        return 1
+    kwargs = {"serverSelectionTimeoutMS": 5000}
+    if "mongodb+srv" in mongo_url:
+        kwargs["tlsCAFile"] = certifi.where()
+    client = MongoClient(mongo_url, **kwargs)
+
+    def records():
+        for path in args.files:
+            yield from read_records(path)
+
+    report = sync_faqs(client[args.database], records(), batch_size=args.batch_size,
+                       dry_run=args.dry_run, delete_missing=not args.keep_missing)
+    for line in report.pop("samples"):
+        print("  " + line)
+    print(("🔍 Dry run: " if args.dry_run else "✅ Synced FAQs: ") + json.dumps(report, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
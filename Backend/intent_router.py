@@ -0,0 +1,156 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import yaml
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+Route = namedtuple("Route", ["answer", "rule", "college_related"])
+
+
+def _route_text(s: str) -> str:
+    # Unlike normalize_text this keeps parenthesised text: "CSE (AI & ML)" -> "cse ai ml".
+    return _NON_ALNUM_RE.sub(" ", (s or "").lower()).strip()
+
+
+# -----------------------------
+# Compiled rule set
+# -----------------------------
+class RuleSet:
+    """Rules and domain keywords compiled into one word-boundary regex, so a
+    question is classified by a single ``finditer`` pass."""
+
+    def __init__(self, config):
+        config = config or {}
+        self.rules = []  # (name, trigger keywords, [(intent keywords, answer)])
+        for rule in config.get("rules", []):
+            intents = [(frozenset(map(_route_text, intent.get("keywords", []))), intent["answer"])
+                       for intent in rule.get("intents", [])]
+            self.rules.append((rule.get("name", "rule"), frozenset(map(_route_text, rule.get("triggers", []))), intents))
+        self.domain_keywords = frozenset(map(_route_text, config.get("domain_keywords", [])))
+
+        keywords = set(self.domain_keywords)
+        for _, triggers, intents in self.rules:
+            keywords |= triggers
+            for intent_keywords, _ in intents:
+                keywords |= intent_keywords
+        keywords.discard("")
+        self.keywords = frozenset(keywords)
+        if keywords:
+            # Longest first so "computer science" wins over a shorter overlap.
+            alternation = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+            self._pattern = re.compile(rf"\b({alternation})(?:e?s)?\b")
+        else:
+            self._pattern = None
+        # Rough footprint for tenant memory accounting: keyword and answer strings and the regex source.
+        strings = list(keywords) + [answer for _, _, intents in self.rules for _, answer in intents]
+        strings += [self._pattern.pattern] if self._pattern is not None else []
+        self.nbytes = sum(map(sys.getsizeof, strings))
+
+    def keywords_in(self, question: str):
+        if self._pattern is None:
+            return frozenset()
+        return frozenset(m.group(1) for m in self._pattern.finditer(_route_text(question)))
+
+    def classify(self, question: str) -> Route:
+        found = self.keywords_in(question)
+        college_related = not found.isdisjoint(self.domain_keywords)
+        for name, triggers, intents in self.rules:
+            if found.isdisjoint(triggers):
+                continue
+            for intent_keywords, answer in intents:
+                if not found.isdisjoint(intent_keywords):
+                    return Route(answer, name, college_related)
+        return Route(None, None, college_related)
+
+
+# -----------------------------
+# Hot-reloading router
+# -----------------------------
+class IntentRouter:
+    """Serves the current RuleSet and reloads it when its source changes.
+
+    The source is a document ``{"_id": "intent_router", "rules": [...],
+    "domain_keywords": [...]}`` in ``collection`` when one is given and the
+    document exists, otherwise the YAML file at ``path``, otherwise the fixed
+    ``default`` config. A daemon thread checks the source every
+    ``reload_interval`` seconds until ``close()``.
+    """
+
+    DOCUMENT_ID = "intent_router"
+
+    def __init__(self, path, collection=None, reload_interval=5.0, default=None):
+        self.path = path
+        self.collection = collection
+        self.reload_interval = reload_interval
+        self.default = default
+        self._ruleset = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._closed = False
+
+    def current(self) -> RuleSet:
+        ruleset = self._ruleset
+        if ruleset is None:
+            with self._lock:
+                if self._ruleset is None:
+                    self._reload_locked()
+                if self._watcher is None:
+                    self._watcher = threading.Thread(target=self._watch, name="intent-router-watcher", daemon=True)
+                    self._watcher.start()
+            ruleset = self._ruleset
+        return ruleset
+
+    def classify(self, question: str) -> Route:
+        return self.current().classify(question)
+
+    @property
+    def nbytes(self):
+        ruleset = self._ruleset
+        return ruleset.nbytes if ruleset is not None else 0
+
+    def close(self):
+        self._closed = True
+
+    def _read_source(self):
+        """Return (fingerprint, loader) for the active source."""
+        if self.collection is not None:
+            doc = self.collection.find_one({"_id": self.DOCUMENT_ID})
+            if doc:
+                return repr(sorted(doc.items())), lambda: doc
+        if self.path is None:
+            return repr(self.default), lambda: self.default
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size), self._load_yaml
+
+    def _load_yaml(self):
+        with open(self.path, encoding="utf-8") as f:
+            return yaml.safe_load(f)
+
+    def _reload_locked(self):
+        try:
+            fingerprint, load = self._read_source()
+            if fingerprint == self._fingerprint and self._ruleset is not None:
+                return
+            ruleset = RuleSet(load())
+        except Exception as e:
+            logging.exception("Error loading intent rules: %s", e)
+            if self._ruleset is None:
+                self._ruleset = RuleSet({})
+            return
+        self._fingerprint = fingerprint
+        self._ruleset = ruleset
+        logging.info("Loaded %d intent rules and %d domain keywords.",
+                     len(ruleset.rules), len(ruleset.domain_keywords))
+
+    def _watch(self):
+        while not self._closed:
+            time.sleep(self.reload_interval)
+            with self._lock:
+                self._reload_locked()
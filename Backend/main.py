@@ -1,16 +1,33 @@
 import os
-import re
+import json
 import logging
 import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from pymongo import MongoClient
 import certifi
-import google.generativeai as genai
-from rapidfuzz import fuzz
 from insert_contact import admin_contact
+from admission import BoundedSlots, CircuitBreaker, RateLimiter, Shed
+from answer_cache import AnswerCache
+from db_async import AsyncFaqStore, SnapshotFaqStore, create_async_client
+from chat_events import ChatEventLog, append_jsonl, note_faq_score
+from executors import ThreadPool
+from faq_corpus import FAQ_SCORE_THRESHOLD, FaqCorpus
+from faq_scoring import FaqScorer
+from faq_shared import SharedFaqCorpus
+from ingest_faqs import read_records
+from intent_router import IntentRouter
+from tenants import DEFAULT_TENANT_ID, Tenant, TenantRegistry, UnknownTenant
+from metrics import (ServerTimingMiddleware, collect_timings, gemini_errors_total, gemini_shed_total,
+                     record_batch, record_response, registry, stage)
+from text_utils import normalize_text as _normalize_text
 
 # -----------------------------
 # Logging setup
@@ -23,6 +40,59 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(me
 load_dotenv()
 MONGO_URL = os.getenv("MONGO_URL")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+FAQ_CACHE_POLL_SECONDS = float(os.getenv("FAQ_CACHE_POLL_SECONDS", "30"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH")  # e.g. answers.sqlite3; unset = memory only
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.0-flash")
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "15"))
+# Admission control: excess or doomed Gemini calls get the admin-contact
+# fallback at once instead of waiting (rates are per second; 0 disables).
+GEMINI_MAX_QUEUE = int(os.getenv("GEMINI_MAX_QUEUE", "32"))
+GEMINI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("GEMINI_QUEUE_TIMEOUT_SECONDS", "2"))
+GEMINI_CLIENT_RATE = float(os.getenv("GEMINI_CLIENT_RATE", "0.5"))
+GEMINI_CLIENT_BURST = int(os.getenv("GEMINI_CLIENT_BURST", "5"))
+GEMINI_GLOBAL_RATE = float(os.getenv("GEMINI_GLOBAL_RATE", "20"))
+GEMINI_GLOBAL_BURST = int(os.getenv("GEMINI_GLOBAL_BURST", "40"))
+# Gemini calls /chat/batch may hold or wait for at once; the rest stay interactive.
+GEMINI_BATCH_CONCURRENCY = int(os.getenv("GEMINI_BATCH_CONCURRENCY", str(max(GEMINI_MAX_CONCURRENCY // 2, 1))))
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "5000"))
+FAQ_BATCH_WORKERS = int(os.getenv("FAQ_BATCH_WORKERS", "-1"))  # -1 = all cores
+# Executors (see faq_scoring.py): blocking I/O (sync MongoDB, files) and FAQ
+# scoring never share threads; FAQ_SCORING_PROCESSES > 0 scores corpora of
+# FAQ_PROCESS_MIN_SIZE+ entries in worker processes.
+IO_EXECUTOR_WORKERS = int(os.getenv("IO_EXECUTOR_WORKERS", "16"))
+FAQ_SCORING_THREADS = int(os.getenv("FAQ_SCORING_THREADS", "2"))
+FAQ_SCORING_PROCESSES = int(os.getenv("FAQ_SCORING_PROCESSES", "0"))
+FAQ_PROCESS_MIN_SIZE = int(os.getenv("FAQ_PROCESS_MIN_SIZE", "20000"))
+RULES_FILE = os.getenv("RULES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.yaml"))
+RULES_COLLECTION = os.getenv("RULES_COLLECTION")  # e.g. "rules"; unset = YAML file only
+RULES_RELOAD_SECONDS = float(os.getenv("RULES_RELOAD_SECONDS", "5"))
+FAQ_PAGE_MAX = int(os.getenv("FAQ_PAGE_MAX", "1000"))
+# Shared by all workers of `uvicorn --workers N` (see faq_shared.py); unset = per-worker corpus.
+FAQ_SHARED_DIR = os.getenv("FAQ_SHARED_DIR")
+FAQ_SHARED_POLL_SECONDS = float(os.getenv("FAQ_SHARED_POLL_SECONDS", "0.5"))
+# Last corpus loaded from MongoDB, served while MongoDB is unreachable; "" disables.
+FAQ_SNAPSHOT_PATH = os.getenv("FAQ_SNAPSHOT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq_snapshot.bin"))
+MONGO_CONNECT_RETRY_MAX_SECONDS = float(os.getenv("MONGO_CONNECT_RETRY_MAX_SECONDS", "30"))
+# Fraction of questions logged in full (1 = all, 0 = none); lower it under load.
+LOG_QUESTION_SAMPLE_RATE = float(os.getenv("LOG_QUESTION_SAMPLE_RATE", "1"))
+# Chat event log (see chat_events.py): buffered in memory, flushed to MongoDB
+# `chat_events` once connected, else appended to CHAT_EVENTS_PATH ("" = drop).
+CHAT_EVENTS_BUFFER_SIZE = int(os.getenv("CHAT_EVENTS_BUFFER_SIZE", "10000"))  # 0 disables
+CHAT_EVENTS_BATCH_SIZE = int(os.getenv("CHAT_EVENTS_BATCH_SIZE", "500"))
+CHAT_EVENTS_FLUSH_SECONDS = float(os.getenv("CHAT_EVENTS_FLUSH_SECONDS", "2"))
+CHAT_EVENTS_PATH = os.getenv("CHAT_EVENTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_events.jsonl"))
+SPELL_CORRECTION = os.getenv("SPELL_CORRECTION", "1") != "0"
+# Other institutions served by this deployment (see tenants.py). Their corpora
+# load on first request; least recently used ones are evicted beyond the budget
+# and reload from TENANT_SNAPSHOT_DIR ("" disables) without rebuilding.
+TENANTS_FILE = os.getenv("TENANTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tenants.yaml"))
+TENANT_MEMORY_BUDGET_MB = float(os.getenv("TENANT_MEMORY_BUDGET_MB", "512"))
+TENANT_SNAPSHOT_DIR = os.getenv("TENANT_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq_tenants"))
 
 # -----------------------------
 # MongoDB setup
@@ -35,27 +105,65 @@ class InMemoryCollection:
     def delete_many(self, _): self.docs = []
     def count_documents(self, query): return len(self.docs)
 
-client = db = faqs = contacts = None
+# Start on the in-memory fallback; connect_mongo_in_background() (run from the
+# app lifespan) swaps in the real collections once MongoDB answers, so workers
+# accept requests immediately instead of blocking on the ping at import.
+client = db = faqs_meta = async_client = None
+faqs = InMemoryCollection([])
+contacts = InMemoryCollection([])
+mongo_connected = False
 
 if not MONGO_URL:
     logging.warning("MONGO_URL not set. Using in-memory fallback.")
-    faqs = InMemoryCollection([])
-    contacts = InMemoryCollection([])
+
+# With MongoDB configured, the corpus starts from the on-disk snapshot (if any)
+# rather than the empty fallback collection, and attach() reconciles it.
+if MONGO_URL and FAQ_SHARED_DIR:
+    faq_corpus = SharedFaqCorpus(None, FAQ_SHARED_DIR, poll_interval=FAQ_CACHE_POLL_SECONDS,
+                                 follow_interval=FAQ_SHARED_POLL_SECONDS)
 else:
-    try:
-        kwargs = {"serverSelectionTimeoutMS": 5000}
-        if "mongodb+srv" in MONGO_URL:
-            kwargs["tlsCAFile"] = certifi.where()
-        client = MongoClient(MONGO_URL, **kwargs)
-        client.admin.command("ping")
-        db = client["chatbot_db"]
-        faqs = db["faqs"]
-        contacts = db["contacts"]
-        logging.info("Connected to MongoDB.")
-    except Exception as e:
-        logging.exception("MongoDB connection failed. Using fallback.")
-        faqs = InMemoryCollection([])
-        contacts = InMemoryCollection([])
+    faq_corpus = FaqCorpus(None if MONGO_URL else faqs, poll_interval=FAQ_CACHE_POLL_SECONDS,
+                           meta=faqs_meta, snapshot_path=FAQ_SNAPSHOT_PATH if MONGO_URL else None)
+faq_store = SnapshotFaqStore(faq_corpus)
+
+def _connect_mongo():
+    kwargs = {"serverSelectionTimeoutMS": 5000}
+    if "mongodb+srv" in MONGO_URL:
+        kwargs["tlsCAFile"] = certifi.where()
+    mongo = MongoClient(MONGO_URL, **kwargs)
+    mongo.admin.command("ping")
+    return mongo
+
+async def connect_mongo_in_background():
+    """Retry the MongoDB connection with backoff, then upgrade from the fallback."""
+    global client, db, faqs, contacts, faqs_meta, async_client, faq_store, mongo_connected
+    delay = 1.0
+    while True:
+        try:
+            mongo = await asyncio.to_thread(_connect_mongo)
+            break
+        except Exception as e:
+            logging.warning("MongoDB connection failed (%s). Using fallback; retrying in %.0fs.", e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MONGO_CONNECT_RETRY_MAX_SECONDS)
+
+    client = mongo
+    db = client["chatbot_db"]
+    faqs = db["faqs"]
+    faqs_meta = db["faqs_meta"]
+    contacts = db["contacts"]
+    # Warm the corpus from the real collection before reporting ready.
+    await asyncio.to_thread(faq_corpus.attach, faqs, faqs_meta)
+    if RULES_COLLECTION:
+        intent_router.collection = db[RULES_COLLECTION]
+    # Request handlers read through the async client so they never block the
+    # loop; the sync client stays for the background corpus watcher.
+    async_client = create_async_client(MONGO_URL)
+    faq_store = AsyncFaqStore(async_client["chatbot_db"]["faqs"])
+    mongo_connected = True
+    # Tenants loaded meanwhile were served from snapshot files; reload them from MongoDB.
+    tenants.clear()
+    logging.info("Connected to MongoDB.")
 
 # -----------------------------
 # Admin info
@@ -66,58 +174,122 @@ admin_email = getattr(admin_contact, "get", lambda x, y=None: "admin@example.com
 # -----------------------------
 # Gemini setup
 # -----------------------------
-if GEMINI_API_KEY:
-    try:
+_genai_module = None
+
+def _genai():
+    # google.generativeai drags in grpc and googleapiclient (~1s), so it is
+    # imported on a worker thread once the server is up (see lifespan) rather
+    # than at startup or on the event loop.
+    global _genai_module
+    if _genai_module is None:
+        import google.generativeai as genai
         genai.configure(api_key=GEMINI_API_KEY)
         logging.info("Configured Gemini client.")
-    except Exception as e:
-        logging.warning("Gemini setup failed: %s", e)
-else:
+        _genai_module = genai
+    return _genai_module
+
+if not GEMINI_API_KEY:
     logging.warning("GEMINI_API_KEY not set. AI responses will not work.")
 
 # -----------------------------
-# Utility: normalize text
+# Custom rules: intent router
 # -----------------------------
-def _normalize_text(s: str) -> str:
-    s = s.lower().strip()
-    s = re.sub(r"\([^)]*\)", "", s)
-    s = re.sub(r"[^a-z0-9\s]", " ", s)
-    return re.sub(r"\s+", " ", s).strip()
+intent_router = IntentRouter(RULES_FILE, reload_interval=RULES_RELOAD_SECONDS)
+
+def _classify(question: str, tenant=None):
+    with stage("route"):
+        return (tenant or default_tenant).router.classify(question)
+
+def handle_hod_query(question: str):
+    return intent_router.classify(question).answer
 
 # -----------------------------
-# Custom rule: detect HOD queries
+# Tenants
 # -----------------------------
-def handle_hod_query(question: str):
-    q = question.lower()
-    if "hod" not in q:
-        return None
+# Requests without a tenant key: this deployment's own college, never evicted.
+default_tenant = Tenant(DEFAULT_TENANT_ID, "Global Academy of Technology", "GAT college",
+                        {"name": admin_name, "email": admin_email}, faq_corpus, intent_router)
 
-    hods = {
-        "cse": "Dr. Kumaraswamy S. is the HOD of the Computer Science and Engineering Department.",
-        "computer science": "Dr. Kumaraswamy S. is the HOD of the Computer Science and Engineering Department.",
-        "ai": "Dr. R. Chandramma is the HOD of the CSE (AI & ML) Department.",
-        "ml": "Dr. R. Chandramma is the HOD of the CSE (AI & ML) Department.",
-        "ise": "Dr. Kiran Y. C. is the HOD of the Information Science Engineering Department.",
-        "information": "Dr. Kiran Y. C. is the HOD of the Information Science Engineering Department.",
-        "ece": "Dr. Madhavi Mallam is the HOD of the Electronics and Communication Engineering Department.",
-        "electronics": "Dr. Madhavi Mallam is the HOD of the Electronics and Communication Engineering Department.",
-        "eee": "Dr. Deepika Masand is the HOD of the Electrical and Electronics Engineering Department.",
-        "electrical": "Dr. Deepika Masand is the HOD of the Electrical and Electronics Engineering Department.",
-        "mechanical": "Dr. Bharat Vinjamuri is the HOD of the Mechanical Engineering Department.",
-        "civil": "Dr. Allamaprabhu Kamatagi is the HOD of the Civil Engineering Department.",
-        "math": "Dr. Rupa K is the HOD of the Department of Mathematics.",
-        "mba": "Dr. Sanjeev Kumar Thalari is the HOD of Management Studies (MBA)."
-    }
+def _build_tenant(tenant_id: str, config: dict) -> Tenant:
+    def path(key):
+        return os.path.join(config["base_dir"], config[key]) if config.get(key) else None
 
-    for key, answer in hods.items():
-        if key in q:
-            return answer
-    return None
+    database = client[config.get("database", f"chatbot_{tenant_id}")] if client is not None else None
+    collection = meta = None
+    if database is not None:
+        collection, meta = database["faqs"], database["faqs_meta"]
+    elif not MONGO_URL:
+        try:
+            collection = InMemoryCollection(list(read_records(path("faq_file"))) if path("faq_file") else [])
+        except Exception as e:
+            logging.exception("Error reading FAQs for tenant %s: %s", tenant_id, e)
+            collection = InMemoryCollection([])
+    # else: MongoDB still connecting; serve the tenant's snapshot file until
+    # connect_mongo_in_background() drops the loaded tenants.
+
+    snapshot_path = None
+    if MONGO_URL and TENANT_SNAPSHOT_DIR:
+        os.makedirs(TENANT_SNAPSHOT_DIR, exist_ok=True)
+        snapshot_path = os.path.join(TENANT_SNAPSHOT_DIR, f"{tenant_id}.bin")
+    # A tenant evicted earlier comes back from its snapshot file (mmap, no index
+    # build) and is reconciled with MongoDB in the background.
+    from_file = collection is not None and snapshot_path is not None and os.path.exists(snapshot_path)
+    corpus = FaqCorpus(None if from_file else collection, FAQ_CACHE_POLL_SECONDS,
+                       meta=None if from_file else meta, snapshot_path=snapshot_path)
+    if from_file:
+        corpus.snapshot()
+        threading.Thread(target=corpus.attach, args=(collection, meta),
+                         name=f"tenant-{tenant_id}-reconcile", daemon=True).start()
+
+    rules = {key: config[key] for key in ("rules", "domain_keywords") if key in config}
+    rules_collection = database[RULES_COLLECTION] if database is not None and RULES_COLLECTION else None
+    router = IntentRouter(path("rules_file"), rules_collection, RULES_RELOAD_SECONDS, default=rules)
+
+    admin = config.get("admin") or {}
+    return Tenant(tenant_id, config.get("name", tenant_id.upper()), config.get("prompt_name"),
+                  {"name": admin.get("name", "the college office"), "email": admin.get("email")},
+                  corpus, router)
+
+tenants = TenantRegistry(TENANTS_FILE, _build_tenant, int(TENANT_MEMORY_BUDGET_MB * 1e6))
+
+async def _tenant(tenant_id: str | None) -> Tenant:
+    """The request's tenant; a tenant's first request loads it off the event loop."""
+    tenant_id = (tenant_id or "").lower()
+    if not tenant_id or tenant_id == DEFAULT_TENANT_ID:
+        return default_tenant
+    tenant = tenants.resident(tenant_id)
+    if tenant is None:
+        try:
+            tenant = await asyncio.to_thread(tenants.get, tenant_id)
+        except UnknownTenant:
+            raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant_id}")
+    return tenant
+
+def _tenant_label(tenant):
+    # Events keep their pre-tenant shape for the default tenant.
+    return None if tenant is None or tenant is default_tenant else tenant.id
+
+# -----------------------------
+# Spelling correction
+# -----------------------------
+# Per tenant, rebuilt in the background whenever its FAQ snapshot or rule set changes.
+spell_corrector = default_tenant.spell
+
+def _correct(question: str, tenant=None) -> str:
+    """Fix misspelled words ("hostle fee") before routing and FAQ matching;
+    Gemini and the event log still get the question as typed."""
+    if not SPELL_CORRECTION or not question:
+        return question
+    with stage("spell"):
+        return (tenant or default_tenant).spell.correct(question)
 
 # -----------------------------
 # FAQ matching
 # -----------------------------
-def get_best_faq_match(user_question: str):
+io_executor = None  # created per app lifespan
+faq_scorer = FaqScorer(FAQ_SCORING_THREADS, FAQ_SCORING_PROCESSES, FAQ_PROCESS_MIN_SIZE, FAQ_BATCH_WORKERS)
+
+def get_best_faq_match(user_question: str, tenant=None):
     if faqs is None:
         return None
 
@@ -125,88 +297,456 @@ def get_best_faq_match(user_question: str):
     if not user_q:
         return None
 
-    try:
-        candidates = list(faqs.find({}, {"question": 1, "answer": 1})) if hasattr(faqs, "find") else list(faqs)
-    except Exception as e:
-        logging.exception("Error reading FAQs: %s", e)
+    snapshot = (tenant or default_tenant).corpus.snapshot()
+    with stage("faq"):
+        # threshold=0 so misses still report their best score to the event log.
+        match = snapshot.best_match(user_q, threshold=0)
+    return _faq_hit(snapshot, match)
+
+async def get_best_faq_match_async(user_question: str, tenant=None):
+    """get_best_faq_match, scored in a worker process for large corpora."""
+    user_q = _normalize_text(user_question or "")
+    if not user_q:
         return None
 
-    best_match = None
-    best_score = -1
-    for faq in candidates:
-        q_text = _normalize_text(faq.get("question", ""))
-        score = fuzz.token_sort_ratio(user_q, q_text)
-        if q_text.startswith(user_q): score += 5
-        if score > best_score:
-            best_score = score
-            best_match = faq
-
-    if best_score >= 70:
-        logging.info("Matched FAQ (score=%d): %s", best_score, best_match.get("question"))
-        return best_match
-    return None
+    snapshot = (tenant or default_tenant).corpus.snapshot()
+    with stage("faq"):
+        match = await faq_scorer.best_match(snapshot, user_q, 0)
+    return _faq_hit(snapshot, match)
+
+def _faq_hit(snapshot, match):
+    if match is None:
+        return None
+
+    idx, score = match
+    note_faq_score(score)
+    if score < FAQ_SCORE_THRESHOLD:
+        return None
+    best_match = snapshot.doc(idx)
+    logging.info("Matched FAQ (score=%d): %s", score, best_match.get("question"))
+    return best_match
 
 # -----------------------------
 # Ask Gemini (AI)
 # -----------------------------
-def ask_gemini(message: str) -> str:
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_PATH)
+gemini_slots = BoundedSlots(GEMINI_MAX_CONCURRENCY, GEMINI_MAX_QUEUE, GEMINI_QUEUE_TIMEOUT_SECONDS,
+                            GEMINI_BATCH_CONCURRENCY)
+gemini_limiter = RateLimiter(GEMINI_CLIENT_RATE, GEMINI_CLIENT_BURST, GEMINI_GLOBAL_RATE, GEMINI_GLOBAL_BURST)
+gemini_breaker = CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET_SECONDS)
+_gemini_model = None
+_gemini_model_lock = threading.Lock()
+
+def _get_model():
+    # One long-lived model instance shared by every request.
+    global _gemini_model
+    if _gemini_model is None:
+        with _gemini_model_lock:
+            if _gemini_model is None:
+                _gemini_model = _genai().GenerativeModel(GEMINI_MODEL)
+    return _gemini_model
+
+async def _get_model_async():
+    # Building the model imports the SDK; never do that on the event loop.
+    return _gemini_model or await asyncio.to_thread(_get_model)
+
+async def _warm_gemini():
+    try:
+        await _get_model_async()
+    except Exception as e:
+        logging.warning("Could not initialise the Gemini client: %s", e)
+
+def _prompt(message: str, tenant=None) -> str:
+    return f"Answer this as {(tenant or default_tenant).prompt_name} assistant:\n{message}"
+
+def _cache_key(message: str, tenant=None) -> str:
+    # Tenants' prompts differ, so their answers are cached apart. Normalized
+    # text has no ":", and default-tenant keys stay as they were on disk.
+    key = _normalize_text(message)
+    return key if _tenant_label(tenant) is None else f"{tenant.id}:{key}"
+
+def _response_text(response) -> str:
+    return response.text.strip() if hasattr(response, "text") else str(response)
+
+def _generate_answer(message: str, tenant=None) -> str:
+    try:
+        response = _get_model().generate_content(
+            _prompt(message, tenant), request_options={"timeout": GEMINI_TIMEOUT_SECONDS}
+        )
+    except Exception:
+        gemini_breaker.record_failure()
+        raise
+    gemini_breaker.record_success()
+    return _response_text(response)
+
+async def _generate_answer_async(message: str, tenant=None, batch=False) -> str:
+    async with gemini_slots.slot(batch):
+        try:
+            response = await asyncio.wait_for(
+                (await _get_model_async()).generate_content_async(_prompt(message, tenant)), GEMINI_TIMEOUT_SECONDS
+            )
+        except Exception:
+            gemini_breaker.record_failure()
+            raise
+    gemini_breaker.record_success()
+    return _response_text(response)
+
+async def _probe_gemini():
+    await asyncio.wait_for((await _get_model_async()).generate_content_async(_prompt("ping")), GEMINI_TIMEOUT_SECONDS)
+
+def _admit_ai(question: str, client=None, tenant=None):
+    """Raise Shed if a Gemini call should not even be queued: the circuit is
+    open or the client / global rate is exhausted. Cached answers are free."""
+    if not GEMINI_API_KEY or answer_cache.get(_cache_key(question, tenant)) is not None:
+        return
+    if not gemini_breaker.allow():
+        raise Shed("circuit_open")
+    reason = gemini_limiter.check(client)
+    if reason:
+        raise Shed(reason)
+
+def _shed(e: Shed, tenant=None):
+    gemini_shed_total.labels(e.reason).inc()
+    return fallback_response(tenant)
+
+def ask_gemini(message: str, tenant=None) -> str:
+    if not GEMINI_API_KEY:
+        return "Sorry, I’m unable to connect to AI right now."
+
+    try:
+        # Identical questions (after normalization) share one cached answer and
+        # concurrent askers share one in-flight Gemini call.
+        with stage("ai"):
+            return answer_cache.get_or_compute(_cache_key(message, tenant), lambda: _generate_answer(message, tenant))
+    except Exception as e:
+        gemini_errors_total.labels("error").inc()
+        logging.exception("Gemini API error: %s", e)
+        return "Sorry, I couldn't generate an answer right now."
+
+async def ask_gemini_async(message: str, tenant=None, batch=False) -> str:
     if not GEMINI_API_KEY:
         return "Sorry, I’m unable to connect to AI right now."
 
     try:
-        model = genai.GenerativeModel("models/gemini-2.0-flash")
-        response = model.generate_content(f"Answer this as GAT college assistant:\n{message}")
-        return response.text.strip() if hasattr(response, "text") else str(response)
+        with stage("ai"):
+            return await answer_cache.aget_or_compute(
+                _cache_key(message, tenant), lambda: _generate_answer_async(message, tenant, batch)
+            )
+    except Shed:
+        raise
+    except asyncio.TimeoutError:
+        gemini_errors_total.labels("timeout").inc()
+        logging.warning("Gemini call exceeded %ss deadline.", GEMINI_TIMEOUT_SECONDS)
+        return "Sorry, I couldn't generate an answer right now."
     except Exception as e:
+        gemini_errors_total.labels("error").inc()
         logging.exception("Gemini API error: %s", e)
         return "Sorry, I couldn't generate an answer right now."
 
 # -----------------------------
 # Chat logic
 # -----------------------------
-def get_response(question: str):
+def resolve_local(question: str, route=None, tenant=None):
+    """Rule and FAQ resolution only: in-process, cheap, never calls Gemini."""
+    tenant = tenant or default_tenant
+    # Step 1: Check for HOD queries first
+    route = route or tenant.router.classify(question)
+    if route.answer:
+        return {"response": route.answer, "source": "rule"}
+
+    # Step 2: FAQ matching
+    faq = get_best_faq_match(question, tenant)
+    if faq:
+        return {"response": faq.get("answer", "No answer found."), "source": "faq"}
+    return None
+
+async def resolve_local_async(question: str, route=None, tenant=None):
+    """resolve_local without scoring large corpora on the event loop."""
+    tenant = tenant or default_tenant
+    route = route or tenant.router.classify(question)
+    if route.answer or not faq_scorer.uses_processes(tenant.corpus.snapshot()):
+        return resolve_local(question, route, tenant)
+    faq = await get_best_faq_match_async(question, tenant)
+    if faq:
+        return {"response": faq.get("answer", "No answer found."), "source": "faq"}
+    return None
+
+def fallback_response(tenant=None):
+    tenant = tenant or default_tenant
+    contact = tenant.admin["name"]
+    if tenant.admin.get("email"):
+        contact += f" at {tenant.admin['email']}"
+    fallback = (
+        f"Sorry, I can only answer queries related to {tenant.name}. "
+        f"Please contact {contact}."
+    )
+    return {"response": fallback, "source": "fallback"}
+
+async def ai_response(question: str, client=None, tenant=None):
+    """Gemini answer for a college question, or the fallback when shed."""
     try:
-        logging.info("Processing question: %s", question)
+        _admit_ai(question, client, tenant)
+        return {"response": await ask_gemini_async(question, tenant), "source": "ai"}
+    except Shed as e:
+        return _shed(e, tenant)
 
-        # Step 1: Check for HOD queries first
-        hod_answer = handle_hod_query(question)
-        if hod_answer:
-            return {"response": hod_answer, "source": "rule"}
+async def _batch_ai_response(question: str, tenant=None, reason=None):
+    """ai_response for a /chat/batch item. The client's bucket is charged once
+    per batch (``reason`` is set when it was refused), the global bucket once
+    per uncached call, and items wait for one of the batch's Gemini slots
+    without the interactive queue cap or deadline. Refused items get the
+    fallback, as on /chat, plus a ``reason`` so callers can retry them later."""
+    if GEMINI_API_KEY and answer_cache.get(_cache_key(question, tenant)) is None:
+        reason = reason or (None if gemini_breaker.allow() else "circuit_open") or gemini_limiter.check_global()
+        if reason:
+            gemini_shed_total.labels(reason).inc()
+            return {**fallback_response(tenant), "reason": reason}
+    return {"response": await ask_gemini_async(question, tenant, batch=True), "source": "ai"}
 
-        # Step 2: FAQ matching
-        faq = get_best_faq_match(question)
-        if faq:
-            return {"response": faq.get("answer", "No answer found."), "source": "faq"}
+event_log = ChatEventLog(CHAT_EVENTS_BUFFER_SIZE, CHAT_EVENTS_BATCH_SIZE, CHAT_EVENTS_FLUSH_SECONDS)
 
-        # Step 3: Gemini AI fallback for college queries
-        if is_college_related(question):
-            return {"response": ask_gemini(question), "source": "ai"}
+def _event_sink():
+    if async_client is not None:
+        return lambda batch: async_client["chatbot_db"]["chat_events"].insert_many(batch, ordered=False)
+    if CHAT_EVENTS_PATH:
+        return lambda batch: asyncio.to_thread(append_jsonl, CHAT_EVENTS_PATH, batch)
+    return None
 
-        # Step 4: Final fallback
-        fallback = (
-            f"Sorry, I can only answer queries related to Global Academy of Technology. "
-            f"Please contact {admin_name} at {admin_email}."
-        )
-        return {"response": fallback, "source": "fallback"}
+def _finish(question: str, source: str, started: int, faq_score=None, tenant=None, batch=False):
+    record_response(source, started, batch)
+    event_log.record(_normalize_text(question or ""), source, started, faq_score, _tenant_label(tenant))
+
+def _log_question(question: str):
+    if LOG_QUESTION_SAMPLE_RATE >= 1 or random.random() < LOG_QUESTION_SAMPLE_RATE:
+        logging.info("Processing question: %s", question)
+
+def get_response(question: str, tenant=None):
+    started = time.perf_counter_ns()
+    try:
+        _log_question(question)
+
+        query = _correct(question, tenant)
+        route = _classify(query, tenant)
+        result = resolve_local(query, route, tenant)
+        if result is None:
+            if route.college_related:
+                # Step 3: Gemini AI fallback for college queries
+                try:
+                    _admit_ai(question, tenant=tenant)
+                    result = {"response": ask_gemini(question, tenant), "source": "ai"}
+                except Shed as e:
+                    result = _shed(e, tenant)
+            else:
+                # Step 4: Final fallback
+                result = fallback_response(tenant)
 
     except Exception as e:
         logging.exception("Error in get_response: %s", e)
-        return {"response": "An error occurred.", "source": "error"}
+        result = {"response": "An error occurred.", "source": "error"}
+    _finish(question, result["source"], started, tenant=tenant)
+    return result
+
+async def get_response_async(question: str, client=None, tenant=None):
+    """Same pipeline as get_response, awaiting Gemini instead of blocking a thread."""
+    started = time.perf_counter_ns()
+    try:
+        _log_question(question)
+
+        query = _correct(question, tenant)
+        route = _classify(query, tenant)
+        result = await resolve_local_async(query, route, tenant)
+        if result is None:
+            if route.college_related:
+                result = await ai_response(question, client, tenant)
+            else:
+                result = fallback_response(tenant)
+
+    except Exception as e:
+        logging.exception("Error in get_response_async: %s", e)
+        result = {"response": "An error occurred.", "source": "error"}
+    _finish(question, result["source"], started, tenant=tenant)
+    return result
+
+async def get_responses_batch(questions, client=None, tenant=None):
+    """Resolve many questions in one pass; results keep the input order.
+
+    Rules are checked for every question, FAQ misses are scored together in
+    one cdist matrix, and the remaining college questions go to Gemini once
+    per distinct normalized question (see _batch_ai_response).
+    """
+    tenant = tenant or default_tenant
+    started = time.perf_counter_ns()
+    results = [None] * len(questions)
+    normalized = [""] * len(questions)
+    rules = tenant.router.current()
+    routes = [None] * len(questions)
+    for i, question in enumerate(questions):
+        try:
+            question = _correct(question, tenant)
+            routes[i] = rules.classify(question)
+        except Exception as e:
+            logging.exception("Error in get_responses_batch: %s", e)
+            results[i] = {"response": "An error occurred.", "source": "error"}
+            continue
+        if routes[i].answer:
+            results[i] = {"response": routes[i].answer, "source": "rule"}
+        else:
+            normalized[i] = _normalize_text(question or "")
+
+    snapshot = tenant.corpus.snapshot()
+    with stage("faq_batch"):
+        # threshold=0 so misses still report their best score to the event log, as on /chat.
+        matches = await faq_scorer.best_matches(snapshot, normalized, 0)
+
+    ai_questions = {}  # normalized -> original text of its first occurrence
+    for i, question in enumerate(questions):
+        if results[i] is not None:
+            continue
+        if matches[i] is not None and matches[i][1] >= FAQ_SCORE_THRESHOLD:
+            results[i] = {"response": snapshot.answers[matches[i][0]], "source": "faq"}
+        elif routes[i].college_related:
+            ai_questions.setdefault(normalized[i], question)
+        else:
+            results[i] = fallback_response(tenant)
+
+    keys = list(ai_questions)
+    # One client rate-limit charge for the whole batch, and only if Gemini is needed.
+    reason = None
+    if GEMINI_API_KEY and any(answer_cache.get(_cache_key(ai_questions[k], tenant)) is None for k in keys):
+        reason = gemini_limiter.check_client(client)
+    answers = await asyncio.gather(*(_batch_ai_response(ai_questions[k], tenant, reason) for k in keys))
+    ai_answers = dict(zip(keys, answers))
+    for i in range(len(questions)):
+        if results[i] is None:
+            results[i] = ai_answers[normalized[i]]
+    for i, result in enumerate(results):
+        _finish(questions[i], result["source"], started, matches[i][1] if matches[i] else None, tenant, batch=True)
+    record_batch(started)
+
+    logging.info("Batch of %d questions resolved (%d distinct AI calls).", len(questions), len(keys))
+    return results
+
+async def _stream_gemini(message: str, tenant=None):
+    """Yield answer chunks as Gemini produces them, then cache the full text."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + GEMINI_TIMEOUT_SECONDS
+    parts = []
+    async with gemini_slots.slot():
+        try:
+            response = await asyncio.wait_for(
+                (await _get_model_async()).generate_content_async(_prompt(message, tenant), stream=True), GEMINI_TIMEOUT_SECONDS
+            )
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                except StopAsyncIteration:
+                    break
+                text = getattr(chunk, "text", "")
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception:
+            gemini_breaker.record_failure()
+            raise
+    gemini_breaker.record_success()
+    if parts:
+        answer_cache.put(_cache_key(message, tenant), "".join(parts).strip())
+
+async def stream_response(question: str, client=None, tenant=None):
+    """Frames for streaming clients: ``{"delta": ...}`` while an AI answer is being
+    generated, then one final ``{"response", "source", "done": True}`` frame.
+    Rule, FAQ, cached and fallback answers arrive as that final frame only."""
+    started = time.perf_counter_ns()
+    try:
+        _log_question(question)
+
+        query = _correct(question, tenant)
+        route = _classify(query, tenant)
+        result = await resolve_local_async(query, route, tenant)
+        if result is None and not route.college_related:
+            result = fallback_response(tenant)
+        if result is None and (not GEMINI_API_KEY or answer_cache.get(_cache_key(question, tenant))):
+            result = await ai_response(question, client, tenant)
+        if result is None:
+            try:
+                _admit_ai(question, client, tenant)
+            except Shed as e:
+                result = _shed(e, tenant)
+        if result is not None:
+            _finish(question, result["source"], started, tenant=tenant)
+            yield {**result, "done": True}
+            return
+
+        parts = []
+        try:
+            async for text in _stream_gemini(question, tenant):
+                parts.append(text)
+                yield {"delta": text}
+            answer = "".join(parts).strip()
+        except Shed as e:
+            result = _shed(e, tenant)
+            _finish(question, result["source"], started, tenant=tenant)
+            yield {**result, "done": True}
+            return
+        except asyncio.TimeoutError:
+            gemini_errors_total.labels("timeout").inc()
+            logging.warning("Gemini stream exceeded %ss deadline.", GEMINI_TIMEOUT_SECONDS)
+            answer = "Sorry, I couldn't generate an answer right now."
+        except Exception as e:
+            gemini_errors_total.labels("error").inc()
+            logging.exception("Gemini API error: %s", e)
+            answer = "Sorry, I couldn't generate an answer right now."
+        _finish(question, "ai", started, tenant=tenant)
+        yield {"response": answer, "source": "ai", "done": True}
+
+    except Exception as e:
+        logging.exception("Error in stream_response: %s", e)
+        _finish(question, "error", started, tenant=tenant)
+        yield {"response": "An error occurred.", "source": "error", "done": True}
 
 # -----------------------------
 # Detect college-related queries
 # -----------------------------
 def is_college_related(question: str) -> bool:
-    keywords = ["college", "admission", "fee", "course", "department", "faculty",
-                "placement", "exam", "hod", "cse", "ece", "ise", "ai", "ml", "mba",
-                "hostel", "transport", "canteen", "library", "scholarship"]
-    return any(word in (question or "").lower() for word in keywords)
+    return intent_router.classify(question).college_related
 
 # -----------------------------
 # FastAPI setup
 # -----------------------------
-app = FastAPI(title="College Chatbot API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global io_executor
+    # asyncio.to_thread (sync MongoDB calls, JSONL writes) runs on this bounded pool.
+    io_executor = ThreadPool(IO_EXECUTOR_WORKERS, "io")
+    asyncio.get_running_loop().set_default_executor(io_executor)
+    faq_scorer.start()
+    started = time.perf_counter()
+    await asyncio.to_thread(intent_router.current)
+    await asyncio.to_thread(faq_corpus.snapshot)
+    default_tenant.load_seconds = round(time.perf_counter() - started, 4)
+    if SPELL_CORRECTION:
+        spell_corrector.index()  # starts the first build without waiting for it
+    connector = asyncio.create_task(connect_mongo_in_background()) if MONGO_URL else None
+    event_flusher = asyncio.create_task(event_log.run(_event_sink))
+    prober = asyncio.create_task(gemini_breaker.run_probe(_probe_gemini)) if GEMINI_API_KEY else None
+    warmer = asyncio.create_task(_warm_gemini()) if GEMINI_API_KEY else None
+    yield
+    if connector is not None:
+        connector.cancel()
+    if prober is not None:
+        prober.cancel()
+    event_flusher.cancel()
+    await asyncio.gather(event_flusher, return_exceptions=True)
+    tenants.clear()
+    faq_scorer.close()
+    await asyncio.to_thread(answer_cache.close)  # writes out queued disk-tier entries
+    if async_client is not None:
+        await async_client.close()
 
+app = FastAPI(title="College Chatbot API", lifespan=lifespan)
+
+app.add_middleware(ServerTimingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
@@ -217,17 +757,186 @@ app.add_middleware(
 
 class ChatInput(BaseModel):
     user_message: str
+    tenant: str | None = None  # institution id from TENANTS_FILE; unset = default
+
+class BatchChatInput(BaseModel):
+    user_messages: list[str] = Field(max_length=MAX_BATCH_SIZE)
+    tenant: str | None = None
+
+def _client_ip(connection):
+    # Behind a reverse proxy, run uvicorn with --proxy-headers so this is the real client.
+    return connection.client.host if connection.client else None
 
 @app.post("/chat")
-async def chat(input: ChatInput):
-    result = await asyncio.to_thread(get_response, input.user_message)
-    return result
+async def chat(input: ChatInput, request: Request):
+    # Rule/FAQ hits resolve inline; only AI misses await Gemini, without a thread.
+    tenant = await _tenant(input.tenant)
+    return await get_response_async(input.user_message, _client_ip(request), tenant)
+
+@app.post("/chat/batch")
+async def chat_batch(input: BatchChatInput, request: Request):
+    tenant = await _tenant(input.tenant)
+    return {"results": await get_responses_batch(input.user_messages, _client_ip(request), tenant)}
+
+async def _sse_frames(question: str, client=None, tenant=None):
+    async for frame in stream_response(question, client, tenant):
+        yield f"data: {json.dumps(frame)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(input: ChatInput, request: Request):
+    tenant = await _tenant(input.tenant)
+    return StreamingResponse(_sse_frames(input.user_message, _client_ip(request), tenant),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/chat/stream")
+async def chat_stream_get(user_message: str, request: Request, tenant: str | None = None):
+    # EventSource can only issue GET requests.
+    return await chat_stream(ChatInput(user_message=user_message, tenant=tenant), request)
+
+@app.websocket("/ws/chat")
+async def chat_ws(websocket: WebSocket, tenant: str | None = None):
+    # One connection serves many questions for one tenant (?tenant=...); each
+    # message is either plain text or {"user_message": "..."} and gets the same
+    # frames as /chat/stream.
+    try:
+        tenant = await _tenant(tenant)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                question = json.loads(message).get("user_message", "")
+            except (ValueError, AttributeError):
+                question = message
+            with collect_timings():
+                async for frame in stream_response(question, _client_ip(websocket), tenant):
+                    await websocket.send_json(frame)
+    except WebSocketDisconnect:
+        pass
+
+async def _ndjson_lines(documents):
+    async for doc in documents:
+        yield json.dumps(doc, ensure_ascii=False) + "\n"
 
 @app.get("/faqs")
-async def list_faqs():
-    docs = list(faqs.find({}, {"question": 1, "answer": 1})) if hasattr(faqs, "find") else list(faqs)
-    return {"count": len(docs), "faqs": docs}
+async def list_faqs(request: Request, after: str | None = None,
+                    limit: int = Query(100, ge=1, le=FAQ_PAGE_MAX), format: str = "json",
+                    tenant: str | None = None):
+    tenant = await _tenant(tenant)
+    # ETag tracks the loaded corpus version, so unchanged FAQs cost a 304.
+    etag = f'W/"{tenant.corpus.snapshot().etag}"'
+    headers = {"ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    # Other tenants are paged from their loaded corpus (positional ids).
+    store = faq_store if tenant is default_tenant else SnapshotFaqStore(tenant.corpus)
+    try:
+        if format == "ndjson":
+            return StreamingResponse(_ndjson_lines(store.stream(after)),
+                                     media_type="application/x-ndjson", headers=headers)
+        docs, next_after = await store.page(after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse({"count": len(docs), "faqs": docs, "next_after": next_after}, headers=headers)
+
+registry.gauge_callback(
+    "answer_cache_lookups_total", "AI answer cache lookups by outcome.",
+    lambda: {(k,): v for k, v in answer_cache.stats().items() if k in ("hits", "misses", "coalesced")},
+    labels=["outcome"], kind="counter",
+)
+registry.gauge_callback(
+    "answer_cache_entries", "Entries held in the in-memory AI answer cache.",
+    lambda: {(): answer_cache.stats()["size"]},
+)
+registry.gauge_callback(
+    "faq_corpus_entries", "FAQs in the loaded corpus snapshot.",
+    lambda: {(): len(faq_corpus.snapshot())},
+)
+registry.gauge_callback(
+    "gemini_circuit_state", "1 for the Gemini circuit breaker's current state.",
+    lambda: {(state,): int(gemini_breaker.state == state)
+             for state in (CircuitBreaker.CLOSED, CircuitBreaker.HALF_OPEN, CircuitBreaker.OPEN)},
+    labels=["state"],
+)
+registry.gauge_callback(
+    "gemini_queue_waiting", "Requests waiting for a Gemini slot.",
+    lambda: {(): gemini_slots.waiting},
+)
+def _executor_stats():
+    stats = dict(faq_scorer.stats())
+    stats["io"] = (IO_EXECUTOR_WORKERS, io_executor.inflight if io_executor else 0)
+    return stats
+
+registry.gauge_callback(
+    "executor_workers", "Configured workers per executor (io, faq_threads, faq_processes).",
+    lambda: {(pool,): workers for pool, (workers, _) in _executor_stats().items()},
+    labels=["pool"],
+)
+registry.gauge_callback(
+    "executor_inflight", "Tasks submitted to each executor and not yet finished.",
+    lambda: {(pool,): inflight for pool, (_, inflight) in _executor_stats().items()},
+    labels=["pool"],
+)
+def _loaded_tenants():
+    return [default_tenant, *tenants.tenants()]
+
+registry.gauge_callback(
+    "tenant_memory_bytes", "Estimated memory of each loaded tenant's FAQ corpus, match index, spelling index and rules.",
+    lambda: {(tenant.id,): tenant.nbytes for tenant in _loaded_tenants()},
+    labels=["tenant"],
+)
+registry.gauge_callback(
+    "tenant_load_seconds", "Duration of each loaded tenant's last load (FAQ corpus and rules).",
+    lambda: {(tenant.id,): tenant.load_seconds for tenant in _loaded_tenants() if tenant.load_seconds is not None},
+    labels=["tenant"],
+)
+registry.gauge_callback(
+    "tenant_memory_budget_bytes", "Memory budget for loaded tenants other than the default one.",
+    lambda: {(): tenants.memory_budget},
+)
+registry.gauge_callback(
+    "tenant_loads_total", "Tenant loads (first requests and reloads after eviction).",
+    lambda: {(): tenants.loads}, kind="counter",
+)
+registry.gauge_callback(
+    "tenant_evictions_total", "Tenants evicted to stay within the memory budget.",
+    lambda: {(): tenants.evictions}, kind="counter",
+)
+registry.gauge_callback(
+    "chat_events_buffered", "Chat events waiting in the ring buffer for the next flush.",
+    lambda: {(): len(event_log)},
+)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return answer_cache.stats()
+
+@app.get("/tenants/stats")
+async def tenant_stats():
+    return {**tenants.stats(), "tenants": {tenant.id: tenant.stats() for tenant in _loaded_tenants()}}
 
 @app.get("/ping")
 async def ping():
     return {"message": "pong"}
+
+@app.get("/ready")
+async def ready():
+    # /ping is liveness; /ready says whether this worker is serving real FAQ data.
+    status = {
+        "mongo": "connected" if mongo_connected else ("connecting" if MONGO_URL else "disabled"),
+        "faq_corpus_loaded": faq_corpus.loaded,
+        "faq_source": faq_corpus.source,
+        "faqs": len(faq_corpus.snapshot()) if faq_corpus.loaded else 0,
+    }
+    # A worker answering from the on-disk snapshot is degraded but useful.
+    ok = faq_corpus.loaded and (mongo_connected or not MONGO_URL or faq_corpus.source == "file")
+    return JSONResponse({"ready": ok, **status}, status_code=200 if ok else 503)
@@ -0,0 +1,230 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Latency buckets in seconds (Prometheus "le" bounds; +Inf is implicit).
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+# -----------------------------
+# Striped primitives
+# -----------------------------
+class _Striped:
+    """Per-thread cells, summed on read. Writers only touch their own thread's
+    cell, so the hot path takes no lock; only cell creation does."""
+
+    def __init__(self, make_cell):
+        self._make_cell = make_cell
+        self._local = threading.local()
+        self._cells = []
+        self._lock = threading.Lock()
+
+    def cell(self):
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = self._local.cell = self._make_cell()
+            with self._lock:
+                self._cells.append(cell)
+        return cell
+
+    def cells(self):
+        with self._lock:
+            return list(self._cells)
+
+
+class Counter:
+    def __init__(self):
+        self._striped = _Striped(lambda: [0])
+
+    def inc(self, amount=1):
+        self._striped.cell()[0] += amount
+
+    def value(self):
+        return sum(cell[0] for cell in self._striped.cells())
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # cell = [count per bucket..., +Inf count, sum]
+        self._striped = _Striped(lambda: [0] * (len(self.buckets) + 2))
+
+    def observe(self, value):
+        cell = self._striped.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def snapshot(self):
+        totals = [0] * (len(self.buckets) + 2)
+        for cell in self._striped.cells():
+            for i, v in enumerate(cell):
+                totals[i] += v
+        return totals[:-1], totals[-1]
+
+
+# -----------------------------
+# Registry / Prometheus exposition
+# -----------------------------
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+
+class _Family:
+    def __init__(self, name, help_text, kind, label_names, factory):
+        self.name, self.help, self.kind = name, help_text, kind
+        self.label_names = tuple(label_names)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def children(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class Registry:
+    def __init__(self):
+        self._families = []
+        self._callbacks = []  # (name, help, kind, callback -> {label tuple: value}, label names)
+
+    def counter(self, name, help_text, labels=()):
+        family = _Family(name, help_text, "counter", labels, Counter)
+        self._families.append(family)
+        return family
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        family = _Family(name, help_text, "histogram", labels, lambda: Histogram(buckets))
+        self._families.append(family)
+        return family
+
+    def gauge_callback(self, name, help_text, callback, labels=(), kind="gauge"):
+        """Metric read at scrape time; ``callback`` returns {label values tuple: number}.
+        Use kind="counter" for cumulative values kept elsewhere (e.g. cache stats)."""
+        self._callbacks.append((name, help_text, kind, callback, tuple(labels)))
+
+    def render(self) -> str:
+        lines = []
+        for family in self._families:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in family.children():
+                if family.kind == "counter":
+                    lines.append(f"{family.name}{_labels(family.label_names, values)} {child.value()}")
+                    continue
+                counts, total = child.snapshot()
+                cumulative = 0
+                for bound, count in zip(child.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{family.name}_bucket{_labels(family.label_names, values, ('le', le))} {cumulative}")
+                lines.append(f"{family.name}_sum{_labels(family.label_names, values)} {total}")
+                lines.append(f"{family.name}_count{_labels(family.label_names, values)} {cumulative}")
+        for name, help_text, kind, callback, label_names in self._callbacks:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for values, value in callback().items():
+                lines.append(f"{name}{_labels(label_names, values)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram("chat_stage_seconds", "Time spent per pipeline stage.", ["stage"])
+request_seconds = registry.histogram("chat_request_seconds", "End-to-end chat resolution time.", ["source"])
+batch_seconds = registry.histogram("chat_batch_seconds", "End-to-end /chat/batch resolution time, once per batch.",
+                                   buckets=BATCH_BUCKETS)
+responses_total = registry.counter("chat_responses_total", "Chat responses by source (fallback = admin contact).", ["source"])
+gemini_errors_total = registry.counter("gemini_errors_total", "Gemini calls that failed or timed out.", ["reason"])
+gemini_shed_total = registry.counter(
+    "gemini_shed_total", "Gemini calls refused and answered with the fallback instead.", ["reason"])
+
+
+# -----------------------------
+# Request-scoped stage timings
+# -----------------------------
+_request_timings = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage into chat_stage_seconds and the request's Server-Timing."""
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter_ns() - started) / 1e9
+        stage_seconds.labels(name).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def current_timings():
+    """(stage, seconds) pairs recorded so far for this request, or None."""
+    return _request_timings.get()
+
+
+@contextmanager
+def collect_timings():
+    """Record stage() spans for code outside an HTTP request (e.g. one WebSocket message)."""
+    token = _request_timings.set([])
+    try:
+        yield
+    finally:
+        _request_timings.reset(token)
+
+
+def record_response(source, started_ns, batch=False):
+    # Batch items are only counted; their batch is timed once by record_batch,
+    # so a long batch cannot swamp the interactive latency histogram.
+    if not batch:
+        elapsed = (time.perf_counter_ns() - started_ns) / 1e9
+        request_seconds.labels(source).observe(elapsed)
+    responses_total.labels(source).inc()
+
+
+def record_batch(started_ns):
+    batch_seconds.labels().observe((time.perf_counter_ns() - started_ns) / 1e9)
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware adding a Server-Timing header built from stage()
+    spans recorded while the request was handled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter_ns()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and timings is not None:
+                entries = [f"{name};dur={seconds * 1e3:.3f}" for name, seconds in timings]
+                entries.append(f"total;dur={(time.perf_counter_ns() - started) / 1e6:.3f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
@@ -0,0 +1,170 @@
+# mine_questions.py
+"""Find frequent questions the bot could not answer locally.
+
+Usage:
+    python mine_questions.py [--jsonl chat_events.jsonl] [--tenant ID] [--days 30] [--top 50] [--out candidates.jsonl]
+
+Reads chat events (MongoDB ``chat_events`` by default, or a JSONL file written
+by the server), keeps those answered by Gemini (``ai``) or the admin-contact
+``fallback``, and groups near-duplicate questions by fuzzy similarity. The
+largest groups are the best candidates for new FAQs: fill in an answer in the
+``--out`` file and sync it with ingest_faqs.py. Events from every tenant are
+mined together unless ``--tenant`` picks one ("default" = requests without a
+tenant).
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import certifi
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from rapidfuzz import fuzz, process
+
+DEFAULT_SOURCES = ("ai", "fallback")
+DEFAULT_SIMILARITY = 85
+DEFAULT_TENANT = "default"
+MAX_QUESTIONS = 20000  # distinct questions clustered, most frequent first
+
+
+# -----------------------------
+# Loading: question -> {count, sources, best_faq_score}
+# -----------------------------
+def _merge(stats, question, source, count, score):
+    entry = stats.setdefault(question, {"count": 0, "sources": Counter(), "best_faq_score": None})
+    entry["count"] += count
+    entry["sources"][source] += count
+    if score is not None and (entry["best_faq_score"] is None or score > entry["best_faq_score"]):
+        entry["best_faq_score"] = score
+
+
+def _event_tenant(tenant):
+    return None if tenant == DEFAULT_TENANT else tenant
+
+
+def load_jsonl(path, sources, since=None, tenant=None):
+    stats = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event.get("source") not in sources or not event.get("question"):
+                continue
+            if since is not None and datetime.fromisoformat(event["ts"]) < since:
+                continue
+            if tenant is not None and event.get("tenant") != _event_tenant(tenant):
+                continue
+            _merge(stats, event["question"], event["source"], 1, event.get("faq_score"))
+    return stats
+
+
+def load_mongo(collection, sources, since=None, tenant=None):
+    match = {"source": {"$in": list(sources)}, "question": {"$ne": ""}}
+    if since is not None:
+        match["ts"] = {"$gte": since}
+    if tenant is not None:
+        match["tenant"] = _event_tenant(tenant)  # None also matches a missing field
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {"question": "$question", "source": "$source"},
+                    "count": {"$sum": 1}, "best_faq_score": {"$max": "$faq_score"}}},
+    ]
+    stats = {}
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        _merge(stats, row["_id"]["question"], row["_id"]["source"], row["count"], row.get("best_faq_score"))
+    return stats
+
+
+# -----------------------------
+# Clustering
+# -----------------------------
+def cluster_questions(stats, similarity=DEFAULT_SIMILARITY, max_questions=MAX_QUESTIONS):
+    """Greedy leader clustering: the most frequent unassigned question claims
+    every unassigned question within ``similarity`` (token_sort_ratio)."""
+    questions = sorted(stats, key=lambda q: stats[q]["count"], reverse=True)[:max_questions]
+    assigned = np.zeros(len(questions), dtype=bool)
+    clusters = []
+    for i, leader in enumerate(questions):
+        if assigned[i]:
+            continue
+        scores = process.cdist([leader], questions, scorer=fuzz.token_sort_ratio,
+                               score_cutoff=similarity, dtype=np.uint8, workers=-1)[0]
+        members = np.flatnonzero((scores > 0) & ~assigned)
+        members = members[members != i]
+        assigned[i] = True
+        assigned[members] = True
+
+        group = [leader] + [questions[j] for j in members]
+        sources = Counter()
+        scores_seen = []
+        for q in group:
+            sources.update(stats[q]["sources"])
+            if stats[q]["best_faq_score"] is not None:
+                scores_seen.append(stats[q]["best_faq_score"])
+        clusters.append({
+            "question": leader,
+            "count": sum(stats[q]["count"] for q in group),
+            "sources": dict(sources),
+            "best_faq_score": max(scores_seen) if scores_seen else None,
+            "variants": sorted(group[1:], key=lambda q: stats[q]["count"], reverse=True)[:10],
+        })
+    clusters.sort(key=lambda c: c["count"], reverse=True)
+    return clusters
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cluster frequent AI/fallback questions into FAQ candidates.")
+    parser.add_argument("--jsonl", help="read events from this file instead of MongoDB chat_events")
+    parser.add_argument("--tenant", help='only mine this tenant\'s events ("default" = no tenant)')
+    parser.add_argument("--days", type=float, help="only consider events from the last N days")
+    parser.add_argument("--sources", default=",".join(DEFAULT_SOURCES), help="comma-separated sources to mine")
+    parser.add_argument("--similarity", type=int, default=DEFAULT_SIMILARITY, help="0-100 token_sort_ratio")
+    parser.add_argument("--min-count", type=int, default=2)
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--out", help="write candidates as JSONL (question, answer, count, ...)")
+    args = parser.parse_args(argv)
+
+    sources = tuple(s.strip() for s in args.sources.split(",") if s.strip())
+    since = datetime.now(timezone.utc) - timedelta(days=args.days) if args.days else None
+
+    if args.jsonl:
+        stats = load_jsonl(args.jsonl, sources, since, args.tenant)
+    else:
+        load_dotenv()
+        mongo_url = os.getenv("MONGO_URL")
+        if not mongo_url:
+            print("❌ MONGO_URL not found in .env file. Use --jsonl or set it.")
+            return 1
+        kwargs = {"serverSelectionTimeoutMS": 5000}
+        if "mongodb+srv" in mongo_url:
+            kwargs["tlsCAFile"] = certifi.where()
+        events = MongoClient(mongo_url, **kwargs)["chatbot_db"]["chat_events"]
+        stats = load_mongo(events, sources, since, args.tenant)
+
+    clusters = [c for c in cluster_questions(stats, args.similarity) if c["count"] >= args.min_count][:args.top]
+    total = sum(entry["count"] for entry in stats.values())
+    covered = sum(c["count"] for c in clusters)
+    print(f"📊 {total} {'/'.join(sources)} events, {len(stats)} distinct questions; "
+          f"top {len(clusters)} clusters cover {covered} ({covered / total:.0%})." if total else "No matching events.")
+    for c in clusters:
+        print(f"{c['count']:6d}  {c['question']}  {c['sources']}  (+{len(c['variants'])} variants)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for c in clusters:
+                f.write(json.dumps({"question": c["question"], "answer": "", **{k: v for k, v in c.items() if k != "question"}},
+                                   ensure_ascii=False) + "\n")
+        print(f"✅ Wrote {len(clusters)} candidates to {args.out}; add answers, then run ingest_faqs.py on it.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
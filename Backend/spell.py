@@ -0,0 +1,189 @@
+import functools
+import logging
+import os
+import re
+import sys
+import threading
+from collections import Counter
+
+from rapidfuzz.distance import OSA
+
+# Only alphabetic query words at least this long are corrected; shorter ones
+# ("cse" vs "ece", "fee" vs "few") are too ambiguous.
+MIN_WORD_LENGTH = 4
+# Allowed edits (insert/delete/substitute/transpose) by query word length.
+LONG_WORD_LENGTH = 8
+MAX_EDITS_SHORT = 1
+MAX_EDITS_LONG = 2
+# Deletes are generated from this prefix only, which bounds the work per word.
+PREFIX_LENGTH = 7
+MEMO_SIZE = 10000
+# Common English words of MIN_WORD_LENGTH..LONG_WORD_LENGTH-1 letters are left
+# alone ("hotel" is not a misspelled "hostel"), and a word of at most
+# SHORT_WORD_LENGTH letters is only corrected to a domain keyword or to a word
+# the FAQ corpus uses at least SHORT_TARGET_MIN_COUNT times.
+COMMON_WORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "common_words.txt")
+SHORT_WORD_LENGTH = 5
+SHORT_TARGET_MIN_COUNT = 2
+
+_WORD_RE = re.compile(r"[A-Za-z]+")
+
+
+def _deletes(word, max_edits):
+    """``word`` and every string obtained by deleting up to ``max_edits`` characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(max_edits):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def vocabulary(texts):
+    """Counter of alphabetic words in ``texts`` (already normalized)."""
+    counts = Counter()
+    for text in texts:
+        counts.update(w for w in text.split() if w.isalpha())
+    return counts
+
+
+@functools.lru_cache(maxsize=None)
+def common_words(path=COMMON_WORDS_FILE):
+    """Frozenset of the words in ``path`` (one per line, ``#`` comments)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return frozenset(line.strip().lower() for line in f if line.strip() and not line.startswith("#"))
+    except OSError as e:
+        logging.warning("No common word list (%s); spelling correction may rewrite English words.", e)
+        return frozenset()
+
+
+# -----------------------------
+# Symmetric-delete index
+# -----------------------------
+class SpellIndex:
+    """SymSpell-style corrector: every dictionary word is stored under each of
+    its prefix deletes, so a query word is corrected by looking up its own
+    (at most ~30) deletes instead of comparing it against the vocabulary.
+    Ties on edit distance go to the more frequent word."""
+
+    def __init__(self, word_counts, keywords=(), common=frozenset()):
+        self.counts = dict(word_counts)
+        self.keywords = frozenset(keywords)
+        self.common = common
+        self._deletes = {}
+        for word in self.counts:
+            if len(word) < MIN_WORD_LENGTH - MAX_EDITS_SHORT:
+                continue
+            for variant in _deletes(word[:PREFIX_LENGTH], MAX_EDITS_LONG):
+                self._deletes.setdefault(variant, []).append(word)
+        self._memo = {}
+        self._nbytes = None
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the dictionary and delete index (the
+        shared common word list excluded). Computed once."""
+        if self._nbytes is None:
+            total = sys.getsizeof(self.counts) + sys.getsizeof(self._deletes) + sys.getsizeof(self.keywords)
+            total += sum(sys.getsizeof(word) for word in self.counts)
+            total += sum(sys.getsizeof(variant) + sys.getsizeof(words) for variant, words in self._deletes.items())
+            self._nbytes = total
+        return self._nbytes
+
+    def correct_word(self, word):
+        """Lowercase correction of ``word`` or None when it is known or has no candidate."""
+        word = word.lower()
+        if word in self.counts or len(word) < MIN_WORD_LENGTH:
+            return None
+        if len(word) < LONG_WORD_LENGTH and word in self.common:
+            return None
+        if word in self._memo:
+            return self._memo[word]
+
+        max_edits = MAX_EDITS_LONG if len(word) >= LONG_WORD_LENGTH else MAX_EDITS_SHORT
+        best, best_key = None, None
+        for variant in _deletes(word[:PREFIX_LENGTH], max_edits):
+            for candidate in self._deletes.get(variant, ()):
+                if abs(len(candidate) - len(word)) > max_edits:
+                    continue
+                if (len(word) <= SHORT_WORD_LENGTH and candidate not in self.keywords
+                        and self.counts[candidate] < SHORT_TARGET_MIN_COUNT):
+                    continue
+                distance = OSA.distance(word, candidate, score_cutoff=max_edits)
+                if distance > max_edits:
+                    continue
+                key = (distance, -self.counts[candidate], candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[word] = best
+        return best
+
+    def correct(self, text):
+        def replace(match):
+            return self.correct_word(match.group()) or match.group()
+        return _WORD_RE.sub(replace, text)
+
+
+# -----------------------------
+# Index tracking the live corpus and rules
+# -----------------------------
+class SpellCorrector:
+    """Keeps a SpellIndex in step with the FAQ snapshot and rule set.
+
+    ``sources()`` returns the current (snapshot, ruleset) pair; both objects
+    are replaced on reload, so identity tells whether the index is stale. A
+    stale index is rebuilt on a background thread while requests keep using
+    the previous one, so no request waits for a rebuild. ``on_build``, when
+    set, is called after each build (tenants re-check their memory budget).
+    """
+
+    def __init__(self, sources):
+        self._sources = sources
+        self.on_build = None
+        self._key = None
+        self._index = None
+        self._builder = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        key = self._sources()
+        if self._key is None or any(a is not b for a, b in zip(key, self._key)):
+            with self._lock:
+                if self._builder is None or not self._builder.is_alive():
+                    self._builder = threading.Thread(target=self._build, args=(key,),
+                                                     name="spell-index-builder", daemon=True)
+                    self._builder.start()
+        return self._index
+
+    def warm(self):
+        """Build synchronously for the current sources (startup, benchmarks)."""
+        self._build(self._sources())
+
+    def _build(self, key):
+        snapshot, ruleset = key
+        counts = vocabulary(snapshot.questions)
+        keywords = [w for keyword in ruleset.keywords for w in keyword.split() if w.isalpha()]
+        counts.update(keywords)
+        index = SpellIndex(counts, keywords, common_words())
+        index.nbytes  # estimated here, off the request path
+        self._index, self._key = index, key
+        logging.info("Built spelling index (%d words, %.1f MB) for FAQ corpus v%s.",
+                     len(index), index.nbytes / 1e6, snapshot.version)
+        if self.on_build is not None:
+            self.on_build()
+
+    @property
+    def nbytes(self):
+        index = self._index
+        return index.nbytes if index is not None else 0
+
+    def correct(self, text):
+        index = self.index()
+        return index.correct(text) if index is not None else text
@@ -0,0 +1,223 @@
+"""Per-institution tenants, loaded on demand and kept in a memory-budgeted LRU.
+
+Tenants are declared in a YAML file (TENANTS_FILE, default tenants.yaml next
+to main.py)::
+
+    tenants:
+      rvce:
+        name: R. V. College of Engineering     # used in the fallback message
+        prompt_name: RVCE college              # "Answer this as <...> assistant"; default: name
+        admin: {name: Ms. A. Rao, email: helpdesk@rvce.example}
+        database: chatbot_rvce                 # faqs/faqs_meta live here; default chatbot_<id>
+        rules_file: rules/rvce.yaml            # same format as rules.yaml, relative to this file
+        faq_file: data/rvce_faqs.jsonl         # FAQs when MongoDB is not configured
+
+Instead of ``rules_file`` the ``rules`` and ``domain_keywords`` of rules.yaml
+may be given inline. A tenant with neither has no rules, so questions that
+miss its FAQs get the admin-contact fallback and never reach Gemini.
+
+Requests without a tenant are served by the default tenant built in main.py
+(``chatbot_db``, rules.yaml, insert_contact.py), which is never evicted.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import yaml
+
+from spell import SpellCorrector
+
+DEFAULT_TENANT_ID = "default"
+TENANT_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+
+class UnknownTenant(KeyError):
+    pass
+
+
+# -----------------------------
+# One institution
+# -----------------------------
+class Tenant:
+    def __init__(self, tenant_id, name, prompt_name, admin, corpus, router):
+        self.id = tenant_id
+        self.name = name
+        self.prompt_name = prompt_name or name
+        self.admin = admin
+        self.corpus = corpus
+        self.router = router
+        self.spell = SpellCorrector(lambda: (corpus.snapshot(), router.current()))
+        self.load_seconds = None
+        self.last_used = time.monotonic()
+
+    @property
+    def nbytes(self):
+        corpus = self.corpus.snapshot().nbytes if self.corpus.loaded else 0
+        return corpus + self.spell.nbytes + self.router.nbytes
+
+    def stats(self):
+        loaded = self.corpus.loaded
+        return {
+            "faqs": len(self.corpus.snapshot()) if loaded else 0,
+            "memory_bytes": self.nbytes,
+            "load_seconds": self.load_seconds,
+            "faq_source": self.corpus.source,
+            "idle_seconds": round(time.monotonic() - self.last_used, 3),
+        }
+
+    def close(self):
+        self.corpus.close()
+        self.router.close()
+
+
+def load_tenant_configs(path):
+    """{tenant_id: config} from the YAML file at ``path`` ({} when missing)."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    base_dir = os.path.dirname(os.path.abspath(path))
+    configs = {}
+    for tenant_id, config in (data.get("tenants") or {}).items():
+        tenant_id = str(tenant_id).lower()
+        if not TENANT_ID_RE.match(tenant_id) or tenant_id == DEFAULT_TENANT_ID:
+            logging.warning("Ignoring tenant %r: ids are lowercase letters, digits, '-' and '_'.", tenant_id)
+            continue
+        configs[tenant_id] = {**(config or {}), "base_dir": base_dir}
+    return configs
+
+
+# -----------------------------
+# LRU of loaded tenants
+# -----------------------------
+class TenantRegistry:
+    """Tenants built on first request and kept in LRU order within ``memory_budget``.
+
+    ``get`` builds a tenant with ``factory(tenant_id, config)`` and loads its
+    corpus and rules before returning; concurrent first requests for the same
+    tenant share one load. After each load the least recently used tenants are
+    evicted (their watchers stopped, their memory released once in-flight
+    requests finish) until the estimated total fits the budget. The tenant
+    just loaded always stays, so a tenant larger than the budget still works.
+    A tenant's spelling index is built in the background after its first
+    request, so the budget is enforced again whenever one finishes.
+    The config file is re-read when it changes, so tenants can be added
+    without a restart.
+    """
+
+    def __init__(self, path, factory, memory_budget):
+        self.path = path
+        self.factory = factory
+        self.memory_budget = memory_budget
+        self._configs = {}
+        self._configs_mtime = None
+        self._tenants = OrderedDict()  # tenant_id -> Tenant, least recently used first
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self.loads = self.evictions = 0
+
+    def _config(self, tenant_id):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns if self.path else None
+        except OSError:
+            mtime = None
+        if mtime != self._configs_mtime:
+            try:
+                self._configs = load_tenant_configs(self.path)
+            except Exception as e:
+                logging.exception("Error loading tenants from %s: %s", self.path, e)
+            self._configs_mtime = mtime
+        config = self._configs.get(tenant_id)
+        if config is None:
+            raise UnknownTenant(tenant_id)
+        return config
+
+    def resident(self, tenant_id):
+        """The loaded tenant, or None; never blocks on a load."""
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                self._tenants.move_to_end(tenant_id)
+                tenant.last_used = time.monotonic()
+            return tenant
+
+    def get(self, tenant_id):
+        tenant = self.resident(tenant_id)
+        if tenant is not None:
+            return tenant
+        with self._lock:
+            config = self._config(tenant_id)
+            load_lock = self._load_locks.setdefault(tenant_id, threading.Lock())
+        with load_lock:
+            tenant = self.resident(tenant_id)
+            if tenant is not None:
+                return tenant
+            started = time.perf_counter()
+            tenant = self.factory(tenant_id, config)
+            tenant.spell.on_build = self.rebalance
+            tenant.corpus.snapshot()
+            tenant.router.current()
+            tenant.load_seconds = round(time.perf_counter() - started, 4)
+            nbytes = tenant.nbytes  # computed once per snapshot; keep it out of the lock
+            with self._lock:
+                self._tenants[tenant_id] = tenant
+                self.loads += 1
+                evicted = self._evict_locked(keep=tenant_id)
+                resident, resident_bytes = len(self._tenants), self._nbytes_locked()
+        logging.info("Loaded tenant %s in %.3fs (%d FAQs, %.1f MB; %d resident, %.1f of %.1f MB).",
+                     tenant_id, tenant.load_seconds, len(tenant.corpus.snapshot()), nbytes / 1e6,
+                     resident, resident_bytes / 1e6, self.memory_budget / 1e6)
+        for old in evicted:
+            old.close()
+        return tenant
+
+    def rebalance(self):
+        """Evict down to the budget again, keeping the most recently used tenant."""
+        with self._lock:
+            if not self._tenants:
+                return
+            evicted = self._evict_locked(keep=next(reversed(self._tenants)))
+        for old in evicted:
+            old.close()
+
+    def _nbytes_locked(self):
+        return sum(tenant.nbytes for tenant in self._tenants.values())
+
+    def _evict_locked(self, keep):
+        evicted = []
+        total = self._nbytes_locked()
+        while total > self.memory_budget:
+            tenant_id = next(iter(self._tenants))
+            if tenant_id == keep:
+                break
+            tenant = self._tenants.pop(tenant_id)
+            total -= tenant.nbytes
+            evicted.append(tenant)
+            self.evictions += 1
+            logging.info("Evicted tenant %s (%.1f MB, idle %.0fs).", tenant_id, tenant.nbytes / 1e6,
+                         time.monotonic() - tenant.last_used)
+        return evicted
+
+    def clear(self):
+        """Drop every loaded tenant (e.g. once MongoDB connects, so they reload from it)."""
+        with self._lock:
+            tenants, self._tenants = list(self._tenants.values()), OrderedDict()
+        for tenant in tenants:
+            tenant.close()
+
+    def tenants(self):
+        with self._lock:
+            return list(self._tenants.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident": len(self._tenants),
+                "memory_bytes": self._nbytes_locked(),
+                "memory_budget_bytes": self.memory_budget,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,15 @@
+import re
+
+# -----------------------------
+# Utility: normalize text
+# -----------------------------
+_PARENS_RE = re.compile(r"\([^)]*\)")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_text(s: str) -> str:
+    s = s.lower().strip()
+    s = _PARENS_RE.sub("", s)
+    s = _NON_ALNUM_RE.sub(" ", s)
+    return _SPACES_RE.sub(" ", s).strip()